@@ -0,0 +1,209 @@
+import argparse
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import integrators
+from pendulum import Pendulum, DamperedPendulum
+from double_pendulum import DoublePendulum
+from exp_decay import ExponentialDecay
+
+
+# benchmark of the solve methods of the Project1 models. every
+# combination of model, method, T, dt and rtol is solved and written
+# as one json line, so results of two versions can be diffed with
+#     python benchmark.py --output new.jsonl --compare old.jsonl
+
+METHODS = ("RK45", "DOP853", "Radau", "BDF", "LSODA")
+FIXED_STEP_METHODS = integrators.FIXED_STEP_METHODS
+
+GRID = {"T": (10, 100), "dt": (0.01, 0.1), "rtol": (1e-3, 1e-6, 1e-9)}
+QUICK_GRID = {"T": (10,), "dt": (0.1,), "rtol": (1e-3, 1e-6)}
+
+
+class CountingCall:
+    # wraps the __call__ of a model to count the rhs evaluations,
+    # including the ones used for finite difference jacobians
+    def __init__(self, fun):
+        self.fun = fun
+        self.calls = 0
+
+    def __call__(self, t, y):
+        self.calls += 1
+        return self.fun(t, y)
+
+
+def count_calls(model):
+    # the solve methods use self.__call__, which finds this
+    # instance attribute before the method of the class
+    model.__call__ = CountingCall(model.__call__)
+    return model
+
+
+def pendulum_energy(u):
+    return u.kinetic + u.potential
+
+
+def relative_drift(energy):
+    return float(np.max(np.abs(energy - energy[0]))/abs(energy[0]))
+
+
+def run_exp_decay(method, T, dt, rtol):
+    model = count_calls(ExponentialDecay(0.4))
+    t, u = model.solve(1, T, dt, method=method, rtol=rtol, atol=rtol*1e-3)
+    return model, {"error": float(np.max(np.abs(u - np.exp(-0.4*t))))}
+
+
+def run_pendulum(method, T, dt, rtol):
+    model = count_calls(Pendulum())
+    y0 = (1, 0)
+    model.solve(y0, T, dt, method=method, rtol=rtol, atol=rtol*1e-3)
+    theta, omega = model.exact(y0, model.t)
+    return model, {"error": float(np.max(np.abs(model.theta - theta))),
+                   "energy_drift": relative_drift(pendulum_energy(model))}
+
+
+def run_dampered(method, T, dt, rtol):
+    model = count_calls(DamperedPendulum(B=0.2))
+    y0 = (1, 0)
+    model.solve(y0, T, dt, method=method, rtol=rtol, atol=rtol*1e-3)
+    reference = DamperedPendulum(B=0.2)
+    reference.solve(y0, T, dt, method="DOP853", rtol=1e-12, atol=1e-12)
+    return model, {"error": float(np.max(np.abs(model.theta
+                                                - reference.theta)))}
+
+
+def run_double(method, T, dt, rtol):
+    # chaotic, so the energy is the only useful measure of error
+    model = count_calls(DoublePendulum())
+    model.solve((1, 1, 1, 1), T, dt, method=method, rtol=rtol,
+                atol=rtol*1e-3)
+    return model, {"energy_drift": relative_drift(pendulum_energy(model))}
+
+
+MODELS = {
+    "ExponentialDecay": (run_exp_decay, METHODS),
+    "Pendulum": (run_pendulum, METHODS + FIXED_STEP_METHODS),
+    "DamperedPendulum": (run_dampered, METHODS + FIXED_STEP_METHODS),
+    "DoublePendulum": (run_double, METHODS + FIXED_STEP_METHODS),
+}
+
+
+def measure(run, method, T, dt, rtol, repeat=3):
+    # best of repeat timed runs, and one run under tracemalloc for
+    # the memory high-water mark since tracing slows numpy down
+    wall_time = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model, errors = run(method, T, dt, rtol)
+        wall_time = min(wall_time, time.perf_counter() - start)
+
+    tracemalloc.start()
+    run(method, T, dt, rtol)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"wall_time": wall_time, "nfev": model.__call__.calls,
+            "peak_memory": peak, **errors}
+
+
+def benchmark(grid=GRID, models=None, methods=None, repeat=3):
+    # yields one record per combination of the grid
+    for name, (run, model_methods) in MODELS.items():
+        if models is not None and name not in models:
+            continue
+        for method in model_methods:
+            if methods is not None and method not in methods:
+                continue
+            # the tolerance does not matter for fixed steps
+            rtols = (None,) if method in FIXED_STEP_METHODS else grid["rtol"]
+            for T, dt, rtol in itertools.product(grid["T"], grid["dt"],
+                                                 rtols):
+                record = {"model": name, "method": method, "T": T,
+                          "dt": dt, "rtol": rtol}
+                record.update(measure(run, method, T, dt, rtol or 1e-3,
+                                      repeat))
+                yield record
+
+
+def key(record):
+    return (record["model"], record["method"], record["T"], record["dt"],
+            record["rtol"])
+
+
+def compare(old, new, slowdown=1.2, resolution=1e-2):
+    # returns the records of new that are slower than slowdown
+    # times the matching record of old (differences below
+    # resolution seconds are timing noise), need more rhs
+    # evaluations or are less accurate
+    old = {key(record): record for record in old}
+    regressions = []
+    for record in new:
+        before = old.get(key(record))
+        if before is None:
+            continue
+        reasons = []
+        if (record["wall_time"] > slowdown*before["wall_time"]
+                and record["wall_time"] - before["wall_time"] > resolution):
+            reasons.append("wall_time")
+        if record["nfev"] > before["nfev"]:
+            reasons.append("nfev")
+        for error in ("error", "energy_drift"):
+            if error in record and record[error] > 2*before[error] + 1e-14:
+                reasons.append(error)
+        if reasons:
+            regressions.append((record, before, reasons))
+    return regressions
+
+
+def read_results(filename):
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the Project1 solvers")
+    parser.add_argument("--quick", action="store_true",
+                        help="small grid for a fast check")
+    parser.add_argument("--model", action="append",
+                        help="only benchmark this model")
+    parser.add_argument("--method", action="append",
+                        help="only benchmark this method")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="timed runs per combination, the best is kept")
+    parser.add_argument("--output", help="json lines file for the results")
+    parser.add_argument("--compare", help="earlier results to compare with")
+    parser.add_argument("--slowdown", type=float, default=1.2,
+                        help="allowed wall time ratio before a regression")
+    args = parser.parse_args(argv)
+
+    grid = QUICK_GRID if args.quick else GRID
+    out = open(args.output, "w") if args.output else sys.stdout
+    results = []
+    try:
+        for record in benchmark(grid, args.model, args.method,
+                                args.repeat):
+            results.append(record)
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.compare:
+        regressions = compare(read_results(args.compare), results,
+                              args.slowdown)
+        for record, before, reasons in regressions:
+            print("regression:", *key(record), ", ".join(reasons),
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
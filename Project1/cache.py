@@ -0,0 +1,29 @@
+import functools
+
+
+def clear_cache(obj):
+    # removes the values stored by every functools.cached_property
+    # of obj, so they are computed again on the next access. called
+    # whenever the arrays they are derived from are replaced
+    for cls in type(obj).__mro__:
+        for name, value in vars(cls).items():
+            if isinstance(value, functools.cached_property):
+                obj.__dict__.pop(name, None)
+
+
+class VelocityMethod:
+    # velocities and kinetic energy are computed exactly
+    # from omega, or with "gradient" by differentiating
+    # the positions numerically
+    _velocity = "exact"
+
+    @property
+    def velocity(self):
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value):
+        if value not in ("exact", "gradient"):
+            raise ValueError(f"Unknown velocity method {value}")
+        self._velocity = value
+        clear_cache(self)
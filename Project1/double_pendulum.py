@@ -1,10 +1,29 @@
+import functools
+import multiprocessing
+import os
+import shutil
+import subprocess
+from multiprocessing import shared_memory
 import numpy as np
 import scipy.integrate
+import scipy.sparse
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
+import integrators
+from cache import VelocityMethod, clear_cache
+
+# solve_ivp methods that make use of a jacobian
+IMPLICIT_METHODS = ("Radau", "BDF", "LSODA")
+
+
+class DoublePendulum(VelocityMethod):
+    # omega' depends on omega, so the half kick in the
+    # Verlet integrator is solved by fixed-point iteration
+    _verlet_iterations = 3
 
-class DoublePendulum:
     def __init__(self, M1=1, L1=1, M2=1, L2=1):
         self.M1 = M1
         self.L1 = L1
@@ -12,7 +31,7 @@ class DoublePendulum:
         self.L2 = L2
 
     def __call__(self, t, y):
-        M1 = self.M2
+        M1 = self.M1
         L1 = self.L1
         M2 = self.M2
         L2 = self.L2
@@ -49,7 +68,63 @@ class DoublePendulum:
 
         return (d_theta_1, d_omega_1, d_theta_2, d_omega_2)
 
-    def solve(self, y0, T, dt, angles="rad"):
+    def jacobian(self, t, y):
+        M1 = self.M1
+        L1 = self.L1
+        M2 = self.M2
+        L2 = self.L2
+
+        g = 9.81
+
+        theta_1 = y[0]
+        omega_1 = y[1]
+        theta_2 = y[2]
+        omega_2 = y[3]
+
+        del_theta = theta_2 - theta_1
+        s = np.sin(del_theta)
+        c = np.cos(del_theta)
+
+        # numerators and denominators of d_omega_1 and d_omega_2
+        # from __call__, and their derivatives with respect to
+        # del_theta (the explicit theta terms are added below)
+        N1 = (M2*L1*omega_1**2*s*c + M2*g*np.sin(theta_2)*c
+              + M2*L2*omega_2**2*s - (M1+M2)*g*np.sin(theta_1))
+        D1 = (M1+M2)*L1 - M2*L1*c**2
+        dN1 = (M2*L1*omega_1**2*(c**2 - s**2) - M2*g*np.sin(theta_2)*s
+               + M2*L2*omega_2**2*c)
+        dD1 = 2*M2*L1*s*c
+
+        N2 = (-M2*L2*omega_2**2*s*c + (M1+M2)*g*np.sin(theta_1)*c
+              - (M1+M2)*L1*omega_1**2*s - (M1+M2)*g*np.sin(theta_2))
+        D2 = (M1+M2)*L2 - M2*L2*c**2
+        dN2 = (-M2*L2*omega_2**2*(c**2 - s**2)
+               - (M1+M2)*g*np.sin(theta_1)*s - (M1+M2)*L1*omega_1**2*c)
+        dD2 = 2*M2*L2*s*c
+
+        f1 = N1/D1
+        f2 = N2/D2
+
+        # quotient rule: (N/D)' = (N' - (N/D)*D')/D
+        J = np.zeros((4, 4) + np.shape(theta_1))
+        J[0, 1] = 1
+        J[2, 3] = 1
+
+        J[1, 0] = (-dN1 - (M1+M2)*g*np.cos(theta_1) + f1*dD1)/D1
+        J[1, 1] = 2*M2*L1*omega_1*s*c/D1
+        J[1, 2] = (dN1 + M2*g*np.cos(theta_2)*c - f1*dD1)/D1
+        J[1, 3] = 2*M2*L2*omega_2*s/D1
+
+        J[3, 0] = (-dN2 + (M1+M2)*g*np.cos(theta_1)*c + f2*dD2)/D2
+        J[3, 1] = -2*(M1+M2)*L1*omega_1*s/D2
+        J[3, 2] = (dN2 - (M1+M2)*g*np.cos(theta_2) - f2*dD2)/D2
+        J[3, 3] = -2*M2*L2*omega_2*s*c/D2
+
+        return J
+
+    def solve(self, y0, T, dt, angles="rad", method="Radau", rtol=1e-3,
+              atol=1e-6, profile=False, energy_drift=None,
+              dense_output=False, checkpoint=None, checkpoint_interval=60):
 
         self.dt = dt
 
@@ -59,6 +134,16 @@ class DoublePendulum:
             if angles == "deg":
                 y0[i] = 180/np.pi * y0[i]
 
+        # with energy_drift the method and tolerances are chosen
+        # to keep the relative energy error below it, see
+        # integrators.tune
+        if energy_drift is not None:
+            settings = integrators.tune(self, y0, dt, energy_drift,
+                                        probe_T=min(T, 10))
+            method = settings["method"]
+            rtol = settings.get("rtol", rtol)
+            atol = settings.get("atol", atol)
+
         fun = self.__call__
         # time interval from 0 to T
         q = (0, T)
@@ -66,13 +151,258 @@ class DoublePendulum:
         steps = int(T/dt)
         eval = np.linspace(0, T, steps)
 
-        a = scipy.integrate.solve_ivp(fun, q, y0, t_eval=eval, method="Radau")
+        # implicit methods get the analytic jacobian instead
+        # of estimating it by finite differences
+        options = {}
+        if method in IMPLICIT_METHODS:
+            options["jac"] = self.jacobian
+
+        # with dense_output only the interpolant of the solution
+        # is kept in sol, the arrays are made by resample at the
+        # times that are needed. fixed steps still need eval
+        if dense_output and method not in integrators.FIXED_STEP_METHODS:
+            eval = None
+
+        # extend continues with the same settings and spacing
+        self._settings = {"method": method, "rtol": rtol, "atol": atol}
+        self._spacing = T/(steps - 1) if steps > 1 else dt
+
+        # with checkpoint the state is written to that directory
+        # every checkpoint_interval seconds, see resume
+        if checkpoint is not None:
+            meta = {"parameters": dict(integrators.parameters(self)),
+                    "dt": dt, "T": T, "spacing": self._spacing}
+            checkpoint = integrators.Checkpoint(checkpoint,
+                                                checkpoint_interval, meta)
+
+        # result keeps the solver statistics (nfev, njev, nlu,
+        # status, message) and with profile=True also the calls,
+        # step sizes and throughput of the integration
+        a = integrators.integrate(fun, q, y0, eval, method, profile,
+                                  self._verlet_iterations, dense_output,
+                                  checkpoint, rtol=rtol, atol=atol,
+                                  **options)
+        t, y = a.t, a.y
+        self.result = a
+        self.sol = a.sol
+        self.T = T
+
+        clear_cache(self)
+
+        if dense_output:
+            for name in ("t_array", "theta_array1", "omega_array1",
+                         "theta_array2", "omega_array2"):
+                self.__dict__.pop(name, None)
+            return
+
+        self.t_array = t
+        self.theta_array1 = y[0]
+        self.omega_array1 = y[1]
+        self.theta_array2 = y[2]
+        self.omega_array2 = y[3]
+
+    @classmethod
+    def resume(cls, path, checkpoint_interval=60):
+
+        # continues a solve(..., checkpoint=path) that was stopped
+        # from its last checkpoint, the new points are appended to
+        # the output in path. returns a pendulum with the whole
+        # solution, memory-mapped from path
+        checkpoint = integrators.Checkpoint.load(path, checkpoint_interval)
+        meta = checkpoint.meta
+
+        pendulum = cls(**meta["parameters"])
+        pendulum.dt = meta["dt"]
+        pendulum.T = meta["T"]
+        pendulum._spacing = meta["spacing"]
+        pendulum._settings = {name: checkpoint.settings[name]
+                              for name in ("method", "rtol", "atol")}
+
+        options = {}
+        if checkpoint.settings["method"] in IMPLICIT_METHODS:
+            options["jac"] = pendulum.jacobian
+
+        a = integrators.resume(pendulum, checkpoint, **options)
+        pendulum.result = a
+        pendulum.sol = None
+
+        pendulum.t_array = a.t
+        pendulum.theta_array1 = a.y[0]
+        pendulum.omega_array1 = a.y[1]
+        pendulum.theta_array2 = a.y[2]
+        pendulum.omega_array2 = a.y[3]
+        return pendulum
+
+    def extend(self, T):
+
+        # continues the last solve from its end to T without
+        # integrating [0, self.T] again. the new time points keep
+        # the spacing of solve, so the solution ends at the last
+        # of them before T. a dense output is extended instead
+        a = self.result
+        method = self._settings["method"]
+        dense_output = self.sol is not None
+        if not dense_output and len(self.t_array) < 2:
+            raise ValueError("Extend needs a solution with at least "
+                             "two time points")
+
+        if dense_output:
+            t_end = T
+            eval = None
+        else:
+            n = int((T - self.T)/self._spacing + 1e-9)
+            t_end = self.T + n*self._spacing
+            eval = self.T + self._spacing*np.arange(n + 1)
+        if method in integrators.FIXED_STEP_METHODS and eval is None:
+            eval = np.linspace(self.T, T, int((T - self.T)/self.dt) + 1)
+        if t_end <= self.T:
+            return
+
+        options = {"rtol": self._settings["rtol"],
+                   "atol": self._settings["atol"]}
+        if method in IMPLICIT_METHODS:
+            options["jac"] = self.jacobian
+        if method in integrators.SOLVERS:
+            options["first_step"] = min(a.h_end, t_end - a.t_end)
+
+        b = integrators.integrate(self, (a.t_end, t_end), a.y_end, eval,
+                                  method, False, self._verlet_iterations,
+                                  dense_output, **options)
+        self.result = b
+        self.T = t_end
+
+        clear_cache(self)
+
+        if dense_output:
+            self.sol = integrators.join(self.sol, b.sol)
+            return
+
+        # the first point is the end of the last solve
+        self.t_array = np.concatenate((self.t_array, b.t[1:]))
+        self.theta_array1 = np.concatenate((self.theta_array1, b.y[0, 1:]))
+        self.omega_array1 = np.concatenate((self.omega_array1, b.y[1, 1:]))
+        self.theta_array2 = np.concatenate((self.theta_array2, b.y[2, 1:]))
+        self.omega_array2 = np.concatenate((self.omega_array2, b.y[3, 1:]))
+
+    def resample(self, t):
+
+        # evaluates the solution of solve(..., dense_output=True)
+        # at the times t without integrating again, the arrays
+        # and derived quantities then belong to these times
+        if getattr(self, "sol", None) is None:
+            raise AttributeError("Solve must be called with "
+                                 "dense_output=True first")
+        t = np.asarray(t, dtype=float)
+        y = self.sol(t)
+
+        clear_cache(self)
+
+        self.t_array = t
+        self.theta_array1 = y[0]
+        self.omega_array1 = y[1]
+        self.theta_array2 = y[2]
+        self.omega_array2 = y[3]
+
+    def iter_solve(self, y0, T, dt, chunk=10000, angles="rad",
+                   method="Radau"):
+
+        # same time points as solve, but integrated and yielded
+        # in blocks of chunk points (t, theta1, omega1, theta2,
+        # omega2), so memory use does not grow with T
+        y0 = np.array(y0, dtype=float)
+        if angles == "deg":
+            y0 = 180/np.pi * y0
+
+        # with one point only t = 0 is yielded and with
+        # none nothing, like the arrays of solve
+        steps = int(T/dt)
+        h = T/(steps - 1) if steps > 1 else dt
+
+        options = {}
+        if method in IMPLICIT_METHODS:
+            options["jac"] = self.jacobian
+
+        blocks = integrators.iter_chunks(self.__call__, y0, h, steps, chunk,
+                                         method, self._verlet_iterations,
+                                         **options)
+        for t, y in blocks:
+            yield t, y[0], y[1], y[2], y[3]
+
+    def _ensemble(self, n):
+
+        # the state of an ensemble of n members is stored as (4, N)
+        # and flattened, so __call__ works on whole rows of the
+        # ensemble at once
+        def fun(t, y):
+            return np.concatenate(self(t, y.reshape(4, n)))
+
+        # every member only couples to itself, so the jacobian
+        # is made of N independent 4x4 blocks
+        rows = (np.arange(4)[:, None, None]*n + np.arange(n)).repeat(4, 1)
+        cols = rows.transpose(1, 0, 2)
+
+        def jac(t, y):
+            J = self.jacobian(t, y.reshape(4, n))
+            return scipy.sparse.csc_matrix((J.ravel(),
+                                            (rows.ravel(), cols.ravel())),
+                                           shape=(4*n, 4*n))
 
+        return fun, jac
+
+    def solve_ensemble(self, y0, T, dt, angles="rad", method="Radau"):
+
+        self.dt = dt
+
+        # y0 has one row (theta1, omega1, theta2, omega2)
+        # per initial condition, shape (N, 4)
+        y0 = np.array(y0, dtype=float)
+        if angles == "deg":
+            y0 = 180/np.pi * y0
+
+        n = len(y0)
+        fun, jac = self._ensemble(n)
+
+        q = (0, T)
+
+        steps = int(T/dt)
+        eval = np.linspace(0, T, steps)
+
+        options = {}
+        if method in IMPLICIT_METHODS:
+            options["jac"] = jac
+
+        a = scipy.integrate.solve_ivp(fun, q, y0.T.ravel(), t_eval=eval,
+                                      method=method, **options)
+
+        # arrays have shape (N, len(t))
+        y = a.y.reshape(4, n, -1)
+        clear_cache(self)
+        self.sol = None
         self.t_array = a.t
-        self.theta_array1 = a.y[0]
-        self.omega_array1 = a.y[1]
-        self.theta_array2 = a.y[2]
-        self.omega_array2 = a.y[3]
+        self.theta_array1 = y[0]
+        self.omega_array1 = y[1]
+        self.theta_array2 = y[2]
+        self.omega_array2 = y[3]
+
+    def poincare(self, y0, T, section="theta1", direction=1,
+                 method="DOP853", rtol=1e-8, atol=1e-8):
+
+        # states where theta1 (or theta2 with section="theta2")
+        # passes 0 (mod 2*pi), increasing with direction=1, for one
+        # initial condition or an ensemble of shape (N, 4) solved in
+        # one call. nothing but the crossings is stored, see
+        # integrators.poincare. returns the member index, time and
+        # state (theta1, omega1, theta2, omega2) of every crossing
+        y0 = np.atleast_2d(np.array(y0, dtype=float))
+        fun, jac = self._ensemble(len(y0))
+
+        options = {}
+        if method in IMPLICIT_METHODS:
+            options["jac"] = jac
+
+        column = {"theta1": 0, "theta2": 2}[section]
+        return integrators.poincare(fun, y0, T, column, direction, method,
+                                    rtol=rtol, atol=atol, **options)
 
     @property
     def t(self):
@@ -86,56 +416,197 @@ class DoublePendulum:
     def theta2(self):
         return self.theta_array2
 
-    @property
+    @functools.cached_property
     def x1(self):
         x1 = self.L1*np.sin(self.theta_array1)
         return x1
 
-    @property
+    @functools.cached_property
     def y1(self):
         y1 = -self.L1*np.cos(self.theta_array1)
         return y1
 
-    @property
+    @functools.cached_property
     def x2(self):
         x2 = self.x1 + self.L2*np.sin(self.theta_array2)
         return x2
 
-    @property
+    @functools.cached_property
     def y2(self):
         y2 = self.y1 - self.L2*np.cos(self.theta_array2)
         return y2
 
-    @property
+    @functools.cached_property
     def potential(self):
         g = 9.81
         P1 = self.M1*g*(self.y1 + self.L1)
         P2 = self.M2*g*(self.y2 + self.L1 + self.L2)
         return P1 + P2
 
-    @property
+    @functools.cached_property
     def vx1(self):
-        return np.gradient(self.x1, self.t_array)
-
-    @property
+        if self.velocity == "gradient":
+            return np.gradient(self.x1, self.t_array, axis=-1)
+        vx1 = np.cos(self.theta_array1)
+        vx1 *= self.omega_array1
+        vx1 *= self.L1
+        return vx1
+
+    @functools.cached_property
     def vy1(self):
-        return np.gradient(self.y1, self.t_array)
-
-    @property
+        if self.velocity == "gradient":
+            return np.gradient(self.y1, self.t_array, axis=-1)
+        vy1 = np.sin(self.theta_array1)
+        vy1 *= self.omega_array1
+        vy1 *= self.L1
+        return vy1
+
+    @functools.cached_property
     def vx2(self):
-        return np.gradient(self.x2, self.t_array)
-
-    @property
+        if self.velocity == "gradient":
+            return np.gradient(self.x2, self.t_array, axis=-1)
+        vx2 = np.cos(self.theta_array2)
+        vx2 *= self.omega_array2
+        vx2 *= self.L2
+        vx2 += self.vx1
+        return vx2
+
+    @functools.cached_property
     def vy2(self):
-        return np.gradient(self.y2, self.t_array)
-
-    @property
+        if self.velocity == "gradient":
+            return np.gradient(self.y2, self.t_array, axis=-1)
+        vy2 = np.sin(self.theta_array2)
+        vy2 *= self.omega_array2
+        vy2 *= self.L2
+        vy2 += self.vy1
+        return vy2
+
+    @functools.cached_property
     def kinetic(self):
-        K1 = 1/2*self.M1*(self.vx1**2+self.vy1**2)
-        K2 = 1/2*self.M2*(self.vx2**2+self.vy2**2)
-        return K1 + K2
+        if self.velocity == "gradient":
+            K1 = 1/2*self.M1*(self.vx1**2+self.vy1**2)
+            K2 = 1/2*self.M2*(self.vx2**2+self.vy2**2)
+            return K1 + K2
 
-    def create_animation(self):
+        M1 = self.M1
+        L1 = self.L1
+        M2 = self.M2
+        L2 = self.L2
+
+        # K = (M1+M2)/2*(L1*omega1)**2 + M2/2*(L2*omega2)**2
+        #     + M2*L1*L2*omega1*omega2*cos(theta1 - theta2)
+        temp = np.subtract(self.theta_array1, self.theta_array2)
+        np.cos(temp, out=temp)
+        temp *= self.omega_array1
+        temp *= self.omega_array2
+        temp *= M2*L1*L2
+
+        kinetic = np.square(self.omega_array1)
+        kinetic *= 1/2*(M1+M2)*L1**2
+        kinetic += temp
+
+        np.square(self.omega_array2, out=temp)
+        temp *= 1/2*M2*L2**2
+        kinetic += temp
+        return kinetic
+
+    def lyapunov(self, y0, T, tau=1, method="DOP853", rtol=1e-8, atol=1e-8):
+
+        # estimate of the largest lyapunov exponent. the tangent
+        # vector d' = J(y) d is integrated together with the state
+        # and renormalized every tau seconds, the exponent is the
+        # mean growth rate log(|d|)/t. y0 may be a single initial
+        # condition or an (N, 4) ensemble, which is integrated as
+        # one system and gives N exponents
+        y0 = np.array(y0, dtype=float)
+        single = y0.ndim == 1
+        y0 = np.atleast_2d(y0)
+        n = len(y0)
+
+        # augmented state (state, tangent vector), shape (8, N)
+        def fun(t, z):
+            z = z.reshape(8, n)
+            y = z[:4]
+            d = z[4:]
+            dy = np.array(self(t, y))
+            dd = np.einsum("ijn,jn->in", self.jacobian(t, y), d)
+            return np.concatenate((dy, dd)).ravel()
+
+        z = np.empty((8, n))
+        z[:4] = y0.T
+        z[4:] = 1/2
+
+        growth = np.zeros(n)
+        t = 0
+        while t < T:
+            t_next = min(t + tau, T)
+            a = scipy.integrate.solve_ivp(fun, (t, t_next), z.ravel(),
+                                          method=method, rtol=rtol, atol=atol)
+            z = a.y[:, -1].reshape(8, n)
+            norm = np.linalg.norm(z[4:], axis=0)
+            growth += np.log(norm)
+            z[4:] /= norm
+            t = t_next
+
+        exponents = growth/T
+        return exponents[0] if single else exponents
+
+    def flip_time_map(self, theta1, theta2, T, tile=16, processes=None,
+                      method="Radau"):
+
+        # time until one of the pendulums flips over, starting at
+        # rest from every (theta1, theta2) pair of the grid. the
+        # result has shape (len(theta2), len(theta1)) like the
+        # arrays from np.meshgrid, nan where no flip happens
+        # before T
+        theta1 = np.asarray(theta1, dtype=float)
+        theta2 = np.asarray(theta2, dtype=float)
+        shape = (len(theta2), len(theta1))
+
+        # the workers write their tiles straight into shared
+        # memory, so the map is never pickled
+        shm = shared_memory.SharedMemory(create=True,
+                                         size=max(8*shape[0]*shape[1], 1))
+        try:
+            result = np.ndarray(shape, dtype=float, buffer=shm.buf)
+
+            # a fresh instance so a solved trajectory is not
+            # sent to every worker
+            pendulum = DoublePendulum(self.M1, self.L1, self.M2, self.L2)
+            tiles = [(shm.name, shape, pendulum,
+                      slice(i, i + tile), slice(j, j + tile),
+                      theta1, theta2, T, method)
+                     for i in range(0, shape[0], tile)
+                     for j in range(0, shape[1], tile)]
+
+            with multiprocessing.Pool(processes) as pool:
+                for _ in pool.imap_unordered(_flip_time_tile, tiles):
+                    pass
+
+            flip_time = result.copy()
+            del result
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return flip_time
+
+    def create_animation(self, fps=None):
+
+        # with fps and a solution from solve(..., dense_output=True)
+        # the frames are evaluated one at a time from the dense
+        # output, otherwise every stored time point is a frame
+        self._frame_times = None
+        if fps is not None:
+            if getattr(self, "sol", None) is None:
+                raise AttributeError("Solve must be called with "
+                                     "dense_output=True first")
+            self._frame_times = np.arange(0, self.T, 1/fps)
+            frames = range(len(self._frame_times))
+            interval = 1000/fps
+        else:
+            frames = range(len(self.x1))
+            interval = 1000*self.dt
 
         # Create empty figure
         fig = plt.figure()
@@ -151,14 +622,22 @@ class DoublePendulum:
         # Call FuncAnimation
         self.animation = animation.FuncAnimation(fig,
                                                  self._next_frame,
-                                                 frames=range(len(self.x1)),
+                                                 frames=frames,
                                                  repeat=None,
-                                                 interval=1000*self.dt,
+                                                 interval=interval,
                                                  blit=True)
 
     def _next_frame(self, i):
-        self.pendulums.set_data((0, self.x1[i], self.x2[i]),
-                                (0, self.y1[i], self.y2[i]))
+        if self._frame_times is not None:
+            theta1, _, theta2, _ = self.sol(self._frame_times[i])
+            x1 = self.L1*np.sin(theta1)
+            y1 = -self.L1*np.cos(theta1)
+            x2 = x1 + self.L2*np.sin(theta2)
+            y2 = y1 - self.L2*np.cos(theta2)
+        else:
+            x1, y1 = self.x1[i], self.y1[i]
+            x2, y2 = self.x2[i], self.y2[i]
+        self.pendulums.set_data((0, x1, x2), (0, y1, y2))
         return self.pendulums,
 
     def show_animation(self):
@@ -167,6 +646,141 @@ class DoublePendulum:
     def save_animation(self, filename):
         self.animation.save(filename, fps=60)
 
+    def _frame_pool(self, step, trail, processes, size, dpi):
+
+        # pool of headless Agg renderers, each worker gets the
+        # decimated positions once through the initializer
+        positions = (self.x1[::step], self.y1[::step],
+                     self.x2[::step], self.y2[::step])
+        extent = 1.1*(self.L1 + self.L2)
+        return multiprocessing.Pool(processes, _init_renderer,
+                                    (positions, trail, extent, size, dpi))
+
+    def export_frames(self, path, step=1, trail=0, processes=None,
+                      size=6, dpi=100):
+
+        # renders every step-th frame to path/frame_00000.png and so
+        # on, trail is the number of earlier frames of the lower
+        # bob that are drawn as a line
+        os.makedirs(path, exist_ok=True)
+        frames = range(len(self.x1[::step]))
+        filenames = [os.path.join(path, f"frame_{i:05d}.png")
+                     for i in frames]
+
+        with self._frame_pool(step, trail, processes, size, dpi) as pool:
+            for _ in pool.imap_unordered(_render_png, zip(frames, filenames),
+                                         chunksize=16):
+                pass
+
+        return filenames
+
+    def export_video(self, filename, fps=None, step=1, trail=0,
+                     processes=None, size=6, dpi=100):
+
+        # renders the frames in parallel and streams them in
+        # order to ffmpeg, by default in real time
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("export_video needs ffmpeg on the PATH")
+        if fps is None:
+            fps = 1/(self.dt*step)
+
+        pixels = int(size*dpi)
+        command = ["ffmpeg", "-y", "-loglevel", "error",
+                   "-f", "rawvideo", "-pix_fmt", "rgba",
+                   "-s", f"{pixels}x{pixels}", "-r", str(fps), "-i", "-",
+                   "-pix_fmt", "yuv420p", filename]
+
+        frames = range(len(self.x1[::step]))
+        with self._frame_pool(step, trail, processes, size, dpi) as pool:
+            encoder = subprocess.Popen(command, stdin=subprocess.PIPE)
+            try:
+                for frame in pool.imap(_render_rgba, frames, chunksize=16):
+                    encoder.stdin.write(frame)
+            finally:
+                encoder.stdin.close()
+                encoder.wait()
+
+        if encoder.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {encoder.returncode}")
+
+
+# figure and positions of the renderer in each worker
+# process of export_frames and export_video
+_renderer = {}
+
+
+def _init_renderer(positions, trail, extent, size, dpi):
+    fig = Figure(figsize=(size, size), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_aspect("equal")
+    ax.axis("off")
+    ax.axis((-extent, extent, -extent, extent))
+
+    trail_line, = ax.plot([], [], "-", lw=1, alpha=0.5)
+    pendulums, = ax.plot([], [], "o-", lw=2)
+
+    _renderer.update(canvas=canvas, pendulums=pendulums,
+                     trail_line=trail_line, positions=positions,
+                     trail=trail)
+
+
+def _draw_frame(i):
+    x1, y1, x2, y2 = _renderer["positions"]
+    _renderer["pendulums"].set_data((0, x1[i], x2[i]), (0, y1[i], y2[i]))
+    if _renderer["trail"]:
+        start = max(i - _renderer["trail"], 0)
+        _renderer["trail_line"].set_data(x2[start:i+1], y2[start:i+1])
+    _renderer["canvas"].draw()
+
+
+def _render_rgba(i):
+    _draw_frame(i)
+    return bytes(_renderer["canvas"].buffer_rgba())
+
+
+def _render_png(args):
+    i, filename = args
+    _draw_frame(i)
+    _renderer["canvas"].print_png(filename)
+
+
+# terminal events for flip_time_map, cos(theta/2) changes
+# sign when theta passes +-pi
+def _flip1(t, y):
+    return np.cos(y[0]/2)
+
+
+def _flip2(t, y):
+    return np.cos(y[2]/2)
+
+
+_flip1.terminal = True
+_flip2.terminal = True
+
+
+def _flip_time_tile(args):
+    # computes one tile of DoublePendulum.flip_time_map
+    name, shape, pendulum, rows, cols, theta1, theta2, T, method = args
+
+    options = {}
+    if method in IMPLICIT_METHODS:
+        options["jac"] = pendulum.jacobian
+
+    shm = shared_memory.SharedMemory(name=name)
+    result = np.ndarray(shape, dtype=float, buffer=shm.buf)
+
+    for i in range(shape[0])[rows]:
+        for j in range(shape[1])[cols]:
+            y0 = (theta1[j], 0, theta2[i], 0)
+            a = scipy.integrate.solve_ivp(pendulum, (0, T), y0,
+                                          method=method,
+                                          events=(_flip1, _flip2), **options)
+            result[i, j] = a.t[-1] if a.status == 1 else np.nan
+
+    del result
+    shm.close()
+
 
 if __name__ == "__main__":
     u = DoublePendulum()
@@ -1,4 +1,5 @@
 import scipy.integrate
+import scipy.linalg
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -9,7 +10,7 @@ class ExponentialDecay:
     def __call__(self, t, u):
         return -self.a*u
 
-    def solve(self, u0, T, dt):
+    def solve(self, u0, T, dt, method="RK45", rtol=1e-3, atol=1e-6):
         fun = self.__call__
         t_span = (0, T)
         y0 = (u0,)
@@ -17,9 +18,58 @@ class ExponentialDecay:
         steps = int(T/dt)
         eval = np.linspace(0, T, steps+1)
 
-        a = scipy.integrate.solve_ivp(fun, t_span, y0, t_eval=eval)
+        a = scipy.integrate.solve_ivp(fun, t_span, y0, t_eval=eval,
+                                      method=method, rtol=rtol, atol=atol)
         return a.t, a.y[0]
 
+    def exact(self, u0, T, dt):
+        # closed form u0*exp(-a*t) on the same time points as
+        # solve. a and u0 may be arrays, the result then has
+        # shape (n_params, len(t))
+        steps = int(T/dt)
+        t = np.linspace(0, T, steps+1)
+
+        a, u0 = np.broadcast_arrays(np.asarray(self.a, dtype=float),
+                                    np.asarray(u0, dtype=float))
+        return t, u0[..., None]*np.exp(-a[..., None]*t)
+
+
+class LinearDecay:
+    # du/dt = -A u for a square matrix A
+    def __init__(self, A):
+        self.A = np.asarray(A, dtype=float)
+        self._propagators = {}
+
+    def __call__(self, t, u):
+        return -self.A @ u
+
+    def propagator(self, dt):
+        # u(t + dt) = exp(-A dt) u(t), computed once per step length
+        if dt not in self._propagators:
+            self._propagators[dt] = scipy.linalg.expm(-self.A*dt)
+        return self._propagators[dt]
+
+    def solve(self, u0, T, dt):
+        # exact solution on the same time points as
+        # ExponentialDecay.solve, u0 may also have shape
+        # (n, k) for k initial vectors
+        steps = int(T/dt)
+        t = np.linspace(0, T, steps+1)
+
+        u0 = np.asarray(u0, dtype=float)
+        u = np.empty(u0.shape + (len(t),))
+        u[..., 0] = u0
+
+        # with T < dt only the point t = 0 is returned
+        if steps == 0:
+            return t, u
+
+        P = self.propagator(t[1] - t[0])
+        for i in range(steps):
+            u[..., i+1] = P @ u[..., i]
+
+        return t, u
+
 
 if __name__ == "__main__":
     decay_model = ExponentialDecay(0.4)
@@ -0,0 +1,551 @@
+import copy
+import inspect
+import json
+import os
+import time
+
+import numpy as np
+import scipy.integrate
+import scipy.interpolate
+import scipy.optimize
+
+
+# fixed-step schemes that can be used instead of solve_ivp
+# through the method argument of the solve methods
+FIXED_STEP_METHODS = ("RK4", "Verlet")
+
+
+def rk4(fun, y0, t, out):
+    # classic fourth order runge-kutta, one step between
+    # consecutive points of t, the state at t[i] is
+    # written to out[:, i]
+    y = np.array(y0, dtype=float)
+    out[:, 0] = y
+
+    for i in range(len(t) - 1):
+        h = t[i+1] - t[i]
+        k1 = np.asarray(fun(t[i], y))
+        k2 = np.asarray(fun(t[i] + h/2, y + h/2*k1))
+        k3 = np.asarray(fun(t[i] + h/2, y + h/2*k2))
+        k4 = np.asarray(fun(t[i] + h, y + h*k3))
+        y = y + h/6*(k1 + 2*k2 + 2*k3 + k4)
+        out[:, i+1] = y
+
+    return out
+
+
+def verlet(fun, y0, t, out, iterations=0, tol=1e-12, stats=None):
+    # velocity verlet (leapfrog) for states laid out as
+    # (theta, omega) pairs, so y[0::2] are the angles and
+    # y[1::2] the angular velocities
+    #
+    # when the angular acceleration depends on omega the first
+    # half kick is implicit and is solved by fixed-point
+    # iteration, this keeps the scheme time-reversible so the
+    # energy error stays bounded instead of drifting. with
+    # iterations=0 it is the ordinary explicit velocity verlet.
+    # the number of calls to fun is stored in stats["calls"]
+    y = np.array(y0, dtype=float)
+    out[:, 0] = y
+
+    z = np.empty_like(y)
+    a = np.asarray(fun(t[0], y))[1::2]
+    calls = 1
+
+    for i in range(len(t) - 1):
+        h = t[i+1] - t[i]
+        theta = y[0::2]
+        omega = y[1::2]
+
+        # half kick
+        omega_half = omega + h/2*a
+        z[0::2] = theta
+        for _ in range(iterations):
+            z[1::2] = omega_half
+            new = omega + h/2*np.asarray(fun(t[i], z))[1::2]
+            calls += 1
+            change = np.max(np.abs(new - omega_half))
+            omega_half = new
+            if change <= tol*(1 + np.max(np.abs(omega_half))):
+                break
+
+        # drift
+        z[0::2] = theta + h*omega_half
+        z[1::2] = omega_half
+
+        # half kick with the acceleration at the new position
+        a = np.asarray(fun(t[i+1], z))[1::2]
+        calls += 1
+        y[0::2] = z[0::2]
+        y[1::2] = omega_half + h/2*a
+        out[:, i+1] = y
+
+    if stats is not None:
+        stats["calls"] = calls
+    return out
+
+
+def fixed_step(method, fun, y0, t, iterations=0, stats=None):
+    # integrates fun over the time points t with one of the
+    # FIXED_STEP_METHODS, returns an array of shape (len(y0), len(t)).
+    # the number of calls to fun is stored in stats["calls"]
+    out = np.empty((len(y0), len(t)))
+    if method == "RK4":
+        if stats is not None:
+            stats["calls"] = 4*(len(t) - 1)
+        return rk4(fun, y0, t, out)
+    elif method == "Verlet":
+        return verlet(fun, y0, t, out, iterations, stats=stats)
+    raise ValueError(f"Unknown fixed-step method {method}")
+
+
+def iter_chunks(fun, y0, h, n, chunk, method="RK45", iterations=0,
+                **options):
+    # integrates over the time points t_k = k*h, k = 0, ..., n-1,
+    # in segments of at most chunk points. only one segment is kept
+    # in memory, the state at the end of a segment is the initial
+    # value of the next one. yields (t, y) with y of shape
+    # (len(y0), len(t))
+    y = np.array(y0, dtype=float)
+
+    for start in range(0, n, chunk):
+        t = h*np.arange(start, min(start + chunk, n))
+
+        # every segment after the first starts at the last
+        # point of the previous one, which is not yielded again
+        if start == 0:
+            grid = t
+        else:
+            grid = np.concatenate(([t_prev], t))
+
+        if len(grid) == 1:
+            out = y[:, None]
+        else:
+            out = integrate(fun, (grid[0], grid[-1]), y, grid, method,
+                            iterations=iterations, **options).y
+
+        if start > 0:
+            out = out[:, 1:]
+
+        y = out[:, -1].copy()
+        t_prev = t[-1]
+        yield t, out
+
+
+# solve_ivp methods that can be stepped by integrate
+SOLVERS = {"RK23": scipy.integrate.RK23, "RK45": scipy.integrate.RK45,
+           "DOP853": scipy.integrate.DOP853, "Radau": scipy.integrate.Radau,
+           "BDF": scipy.integrate.BDF, "LSODA": scipy.integrate.LSODA}
+
+
+class Profiler:
+    # wraps a right hand side to count and time its calls, and
+    # collects the step size history of integrate
+    def __init__(self, fun):
+        self.fun = fun
+        self.calls = 0
+        self.time = 0.0
+        # (t, h, rejected) for every accepted step, rejected is the
+        # number of rejected attempts before it, or None when the
+        # solver does not tell
+        self.steps = []
+
+    def __call__(self, t, y):
+        start = time.perf_counter()
+        out = self.fun(t, y)
+        self.time += time.perf_counter() - start
+        self.calls += 1
+        return out
+
+    def report(self, t_span, wall_time):
+        steps = np.array([step[:2] for step in self.steps]).reshape(-1, 2)
+        rejected = [step[2] for step in self.steps]
+        return {"calls": self.calls,
+                "call_time": self.time,
+                "wall_time": wall_time,
+                "t": steps[:, 0],
+                "h": steps[:, 1],
+                "rejected": rejected,
+                "throughput": (t_span[1] - t_span[0])/wall_time}
+
+
+class Checkpoint:
+    # periodic snapshots of a running integrate in the directory
+    # path, so that it can be continued by resume when the process
+    # dies. output.bin holds one record (t, y) per point of t_eval
+    # that has been reached, state.npz the solver state (t, y and
+    # the next step size), the settings, any meta data of the
+    # caller and the number of records that belong to the state.
+    # the snapshot is taken at most every interval seconds
+    def __init__(self, path, interval=60.0, meta=None):
+        self.path = path
+        self.interval = interval
+        self.meta = meta or {}
+        self.settings = None
+        self.state = None
+        self.n_out = 0
+        self.blocks = []
+        self.last = time.perf_counter()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def start(self, t_eval, n, settings):
+        # a new integration of n equations, an earlier
+        # checkpoint in path is replaced
+        os.makedirs(self.path, exist_ok=True)
+        np.save(self._file("t_eval.npy"), t_eval)
+        open(self._file("output.bin"), "wb").close()
+        self.settings = settings
+        self.width = 1 + n
+        self.n_out = 0
+
+    def append(self, t, y):
+        self.blocks.append(np.vstack((t, y)).T)
+
+    def save(self, solver, force=False):
+        if not force and time.perf_counter() - self.last < self.interval:
+            return
+
+        # the output is written before the state that refers to it,
+        # and the state is replaced in one rename, so a crash at any
+        # point leaves a consistent checkpoint
+        with open(self._file("output.bin"), "ab") as f:
+            for block in self.blocks:
+                f.write(np.ascontiguousarray(block, dtype=float).tobytes())
+                self.n_out += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+        self.blocks = []
+
+        tmp = self._file("state.tmp.npz")
+        np.savez(tmp, t=solver.t, y=solver.y, h=next_step(solver),
+                 t_bound=solver.t_bound, n_out=self.n_out,
+                 settings=json.dumps(self.settings),
+                 meta=json.dumps(self.meta))
+        os.replace(tmp, self._file("state.npz"))
+        self.last = time.perf_counter()
+
+    @classmethod
+    def load(cls, path, interval=60.0):
+        # the last checkpoint in path, records written after it are
+        # dropped so that resume appends right after the state
+        checkpoint = cls(path, interval)
+        with np.load(checkpoint._file("state.npz")) as state:
+            checkpoint.state = {name: state[name] for name in state.files}
+        checkpoint.settings = json.loads(str(checkpoint.state["settings"]))
+        checkpoint.meta = json.loads(str(checkpoint.state["meta"]))
+        checkpoint.n_out = int(checkpoint.state["n_out"])
+        checkpoint.width = 1 + len(checkpoint.state["y"])
+        checkpoint.t_eval = np.load(checkpoint._file("t_eval.npy"))
+
+        os.truncate(checkpoint._file("output.bin"),
+                    checkpoint.n_out*checkpoint.width*np.dtype(float).itemsize)
+        return checkpoint
+
+    def output(self):
+        # (t, y) of all records, memory-mapped from output.bin
+        records = np.memmap(self._file("output.bin"), dtype=float, mode="r",
+                            shape=(self.n_out, self.width))
+        return records[:, 0], records[:, 1:].T
+
+
+def next_step(solver):
+    # the step size an OdeSolver will try next, LSODA does
+    # not expose it so its last step size is used
+    h = getattr(solver, "h_abs", None)
+    return solver.step_size if h is None else h
+
+
+def integrate(fun, t_span, y0, t_eval, method="RK45", profile=False,
+              iterations=0, dense_output=False, checkpoint=None,
+              **options):
+    # same as scipy.integrate.solve_ivp for the methods in SOLVERS
+    # and FIXED_STEP_METHODS, but the steps are taken here so they
+    # can be recorded. with profile=True the result has a
+    # "profile" entry with the calls to fun, their time, the step
+    # history and the throughput in simulated seconds per second.
+    # with dense_output=True the result has a "sol" entry that
+    # evaluates the solution at any t in t_span, t_eval may then
+    # be None to only keep the accepted steps in t and y.
+    # checkpoint is a Checkpoint that is written while integrating,
+    # see resume. t_end, y_end and h_end of the result are the
+    # state at the end and the next step size, to continue from.
+
+    # fun is only wrapped when profiling, the wrapper costs
+    # time in every call
+    profiler = Profiler(fun) if profile else None
+    start = time.perf_counter()
+
+    if checkpoint is not None:
+        if method in FIXED_STEP_METHODS or t_eval is None:
+            raise ValueError("Checkpoints need t_eval and one of the "
+                             "methods in SOLVERS")
+        # a loaded checkpoint already has its settings
+        if checkpoint.state is None:
+            settings = {"method": method, "iterations": iterations}
+            settings.update((name, value) for name, value in options.items()
+                            if isinstance(value, (bool, int, float, str))
+                            and name != "first_step")
+            checkpoint.start(t_eval, len(y0), settings)
+
+    if method in FIXED_STEP_METHODS:
+        # fixed steps are taken between the points of t_eval
+        if t_eval is None:
+            raise ValueError(f"{method} needs the time points t_eval")
+        stats = {}
+        y = fixed_step(method, profiler or fun, y0, t_eval, iterations,
+                       stats)
+        h = np.diff(t_eval)
+        if profile:
+            profiler.steps = list(zip(t_eval[1:], h, [0]*len(h)))
+        result = scipy.optimize.OptimizeResult(
+            t=t_eval, y=y, nfev=stats["calls"], njev=0, nlu=0, status=0,
+            message="The solver successfully reached the end of the "
+                    "integration interval.", success=True, sol=None,
+            t_end=t_eval[-1], y_end=y[:, -1], h_end=h[-1] if len(h) else 0)
+        if dense_output:
+            result.sol = hermite(fun, t_eval, y)
+    else:
+        result = _step_solver(SOLVERS[method], fun, t_span, y0, t_eval,
+                              profiler, dense_output,
+                              checkpoint, **options)
+
+    if profile:
+        result.profile = profiler.report(t_span,
+                                         time.perf_counter() - start)
+    return result
+
+
+def hermite(fun, t, y):
+    # piecewise cubic through the states y at the points t with the
+    # slopes fun(t, y), the dense output of the fixed-step methods
+    dydt = np.column_stack([np.asarray(fun(t[i], y[:, i]), dtype=float)
+                            for i in range(len(t))])
+    return scipy.interpolate.CubicHermiteSpline(t, y, dydt, axis=1,
+                                                extrapolate=False)
+
+
+def join(sol, other):
+    # the dense outputs of two consecutive integrations as one,
+    # other starts where sol ends
+    if isinstance(sol, scipy.interpolate.PPoly):
+        sol.extend(other.c, other.x[1:])
+        return sol
+    return scipy.integrate.OdeSolution(
+        np.concatenate((sol.ts, other.ts[1:])),
+        sol.interpolants + other.interpolants)
+
+
+def _step_solver(solver_class, fun, t_span, y0, t_eval, profiler=None,
+                 dense_output=False, checkpoint=None, **options):
+    if profiler is not None:
+        fun = profiler
+    solver = solver_class(fun, t_span[0], y0, t_span[1], **options)
+
+    # runge-kutta solvers call fun n_stages times per attempted
+    # step, so the rejected attempts can be counted
+    n_stages = getattr(solver, "n_stages", None)
+
+    if t_eval is not None:
+        t_eval = np.asarray(t_eval)
+        t_eval_i = 0
+    ts = []
+    ys = []
+    # the dense output of every step, for scipy.integrate.OdeSolution
+    steps = [t_span[0]]
+    interpolants = []
+
+    status = None
+    while status is None:
+        if profiler is not None:
+            calls = profiler.calls
+        message = solver.step()
+
+        if solver.status == "finished":
+            status = 0
+        elif solver.status == "failed":
+            status = -1
+            break
+
+        if profiler is not None:
+            rejected = None
+            if n_stages is not None:
+                rejected = (profiler.calls - calls)//n_stages - 1
+            profiler.steps.append((solver.t, solver.t - solver.t_old,
+                                   rejected))
+
+        sol = None
+        if dense_output:
+            sol = solver.dense_output()
+            steps.append(solver.t)
+            interpolants.append(sol)
+
+        if t_eval is None:
+            ts.append([solver.t])
+            ys.append(solver.y[:, None])
+            continue
+
+        # the requested points in the last step are
+        # evaluated with the dense output of the step
+        t_eval_i_new = np.searchsorted(t_eval, solver.t, side="right")
+        t_eval_step = t_eval[t_eval_i:t_eval_i_new]
+        if t_eval_step.size > 0:
+            if sol is None:
+                sol = solver.dense_output()
+            ts.append(t_eval_step)
+            ys.append(sol(t_eval_step))
+            t_eval_i = t_eval_i_new
+            if checkpoint is not None:
+                checkpoint.append(t_eval_step, ys[-1])
+
+        if checkpoint is not None:
+            checkpoint.save(solver, force=status is not None)
+
+    if t_eval is None:
+        ts.insert(0, [t_span[0]])
+        ys.insert(0, np.asarray(y0, dtype=float)[:, None])
+
+    t = np.concatenate(ts) if ts else np.array([])
+    y = np.hstack(ys) if ys else np.empty((len(y0), 0))
+    if status == 0:
+        message = ("The solver successfully reached the end of the "
+                   "integration interval.")
+
+    sol = None
+    if dense_output and interpolants:
+        sol = scipy.integrate.OdeSolution(steps, interpolants)
+
+    return scipy.optimize.OptimizeResult(
+        t=t, y=y, nfev=solver.nfev, njev=solver.njev, nlu=solver.nlu,
+        status=status, message=message, success=status == 0, sol=sol,
+        t_end=solver.t, y_end=solver.y, h_end=next_step(solver))
+
+
+def resume(fun, checkpoint, **options):
+    # continues the integration of checkpoint, a Checkpoint.load of
+    # a stopped integrate(..., checkpoint=...), from its state with
+    # the same settings. options are the ones that could not be
+    # stored, like jac. t and y of the result are all the points
+    # of t_eval, memory-mapped from the checkpoint
+    settings = dict(checkpoint.settings)
+    method = settings.pop("method")
+    iterations = settings.pop("iterations")
+    state = checkpoint.state
+    t, t_bound = float(state["t"]), float(state["t_bound"])
+
+    if t < t_bound:
+        # the first step is the one the solver would have tried
+        first_step = min(float(state["h"]), t_bound - t)
+        result = integrate(fun, (t, t_bound), state["y"],
+                           checkpoint.t_eval[checkpoint.n_out:], method,
+                           iterations=iterations, checkpoint=checkpoint,
+                           first_step=first_step, **settings, **options)
+    else:
+        result = scipy.optimize.OptimizeResult(
+            nfev=0, njev=0, nlu=0, status=0, success=True, sol=None,
+            message="The solver successfully reached the end of the "
+                    "integration interval.",
+            t_end=t, y_end=state["y"], h_end=float(state["h"]))
+
+    result.t, result.y = checkpoint.output()
+    return result
+
+
+class Crossing:
+    # event of solve_ivp for the angle y[index], zero where the
+    # angle is a multiple of pi. poincare keeps the crossings of
+    # multiples of 2*pi
+    terminal = False
+
+    def __init__(self, index, direction):
+        self.index = index
+        self.direction = direction
+
+    def __call__(self, t, y):
+        return np.sin(y[self.index])
+
+
+def poincare(fun, y0, T, section=0, direction=1, method="DOP853",
+             **options):
+    # poincare section theta = 0 (mod 2*pi) of the angle in column
+    # section of the ensemble y0, shape (N, m), where fun works on
+    # the flattened state of shape (m, N). the whole ensemble is
+    # one call to solve_ivp with one event per member, and only
+    # the state at T is stored besides the crossings. direction=1
+    # keeps the crossings with increasing angle. returns the member
+    # index, time and state (shape (K, m)) of every crossing,
+    # ordered by time
+    y0 = np.array(y0, dtype=float)
+    n, m = y0.shape
+
+    events = [Crossing(section*n + i, direction) for i in range(n)]
+    a = scipy.integrate.solve_ivp(fun, (0, T), y0.T.ravel(), method=method,
+                                  t_eval=(T,), events=events, **options)
+
+    index = np.concatenate([np.full(len(t), i)
+                            for i, t in enumerate(a.t_events)])
+    t = np.concatenate(a.t_events)
+    states = np.concatenate([y.reshape(-1, m, n)[:, :, i]
+                             for i, y in enumerate(a.y_events)])
+
+    # sin(theta) also vanishes at odd multiples of pi
+    keep = np.cos(states[:, section]) > 0
+    order = np.argsort(t[keep], kind="stable")
+    return index[keep][order], t[keep][order], states[keep][order]
+
+
+# candidates for tune, the tolerances are tried from the loosest
+TUNE_METHODS = ("RK45", "DOP853", "Radau", "LSODA") + FIXED_STEP_METHODS
+TUNE_RTOLS = (1e-3, 1e-5, 1e-7, 1e-9, 1e-11)
+
+# settings found by tune, see tuned_settings
+_tuned = {}
+
+
+def parameters(model):
+    # the constructor arguments, stored as attributes with the same name
+    names = list(inspect.signature(type(model).__init__).parameters)[1:]
+    return tuple((name, getattr(model, name)) for name in names)
+
+
+def energy_drift(model):
+    # largest relative change of kinetic + potential energy
+    energy = model.kinetic + model.potential
+    return np.max(np.abs(energy - energy[0]))/(abs(energy[0]) or 1)
+
+
+def tune(model, y0, dt, drift, probe_T=10, methods=TUNE_METHODS,
+         rtols=TUNE_RTOLS):
+    # finds the cheapest method and rtol (with atol = rtol/1000)
+    # that keeps the relative energy drift below drift on a probe
+    # solve of model from y0 over probe_T seconds. the cost is the
+    # number of rhs and jacobian evaluations. the result is cached
+    # per class, parameters, dt and drift
+    if any(np.ndim(value) for _, value in parameters(model)):
+        raise ValueError("Tune needs a model with scalar parameters")
+    key = (type(model).__name__, parameters(model), dt, drift)
+    if key in _tuned:
+        return _tuned[key]
+
+    best = None
+    for method in methods:
+        for rtol in (None,) if method in FIXED_STEP_METHODS else rtols:
+            settings = {"method": method}
+            if rtol is not None:
+                settings.update(rtol=rtol, atol=rtol*1e-3)
+
+            probe = copy.copy(model)
+            probe.solve(y0, probe_T, dt, profile=True, **settings)
+            if energy_drift(probe) <= drift:
+                cost = probe.result.profile["calls"] + probe.result.njev
+                if best is None or cost < best[0]:
+                    best = (cost, settings)
+                # tighter tolerances only cost more
+                break
+
+    if best is None:
+        raise ValueError(f"No method reaches an energy drift of {drift}")
+
+    _tuned[key] = best[1]
+    return best[1]
@@ -0,0 +1,207 @@
+import functools
+import numpy as np
+import scipy.integrate
+import matplotlib.pyplot as plt
+
+import integrators
+from cache import VelocityMethod, clear_cache
+
+
+class NPendulum(VelocityMethod):
+    # chain of N point masses M[k] on massless rods of length L[k],
+    # the double pendulum is the case N = 2. the state is laid out
+    # as (theta_1, omega_1, ..., theta_N, omega_N) like the one of
+    # DoublePendulum, so y[0::2] are the angles and y[1::2] the
+    # angular velocities
+
+    # omega' depends on omega, so the half kick in the
+    # Verlet integrator is solved by fixed-point iteration
+    _verlet_iterations = 3
+
+    def __init__(self, M=(1, 1, 1), L=(1, 1, 1)):
+        self.M = M
+        self.L = L
+
+    @property
+    def N(self):
+        return np.broadcast(np.atleast_1d(self.M),
+                            np.atleast_1d(self.L)).size
+
+    def _links(self):
+        # masses and lengths as arrays of length N, and mu[i, j],
+        # the mass below link max(i, j) that links i and j carry
+        m, l = np.broadcast_arrays(np.asarray(self.M, dtype=float),
+                                   np.asarray(self.L, dtype=float))
+        m = np.atleast_1d(m)
+        l = np.atleast_1d(l)
+        below = np.cumsum(m[::-1])[::-1]
+        i = np.arange(len(m))
+        mu = below[np.maximum.outer(i, i)]
+        return m, l, mu
+
+    def __call__(self, t, y):
+        g = 9.81
+
+        # y has shape (2N,) or (2N, K) for an ensemble of K states
+        y = np.asarray(y, dtype=float)
+        m, l, mu = self._links()
+        theta = y[0::2]
+        omega = y[1::2]
+
+        # the euler-lagrange equations divided by L[i] give
+        #     sum_j A[i, j] omega_j' = b[i]
+        # with A[i, j] = mu[i, j]*L[j]*cos(theta_i - theta_j) and
+        #     b[i] = -sum_j mu[i, j]*L[j]*sin(theta_i - theta_j)*omega_j**2
+        #            - g*mu[i, i]*sin(theta_i)
+        # the links are the last two axes so the systems of the
+        # whole ensemble are solved in one call
+        theta = np.moveaxis(theta, 0, -1)[..., :, None]
+        omega = np.moveaxis(omega, 0, -1)
+        delta = theta - np.swapaxes(theta, -1, -2)
+        ml = mu*l
+
+        A = np.cos(delta)
+        A *= ml
+        b = -np.einsum("...ij,...j->...i", ml*np.sin(delta), omega**2)
+        b -= g*np.diagonal(mu)*np.sin(theta[..., 0])
+
+        d_omega = np.linalg.solve(A, b[..., None])[..., 0]
+
+        dy = np.empty_like(y)
+        dy[0::2] = y[1::2]
+        dy[1::2] = np.moveaxis(d_omega, -1, 0)
+        return dy
+
+    def solve(self, y0, T, dt, angles="rad", method="RK45", rtol=1e-3,
+              atol=1e-6, profile=False):
+
+        self.dt = dt
+
+        # y0 = (theta_1, omega_1, ..., theta_N, omega_N)
+        y0 = np.array(y0, dtype=float)
+        if angles == "deg":
+            y0 = 180/np.pi * y0
+
+        steps = int(T/dt)
+        eval = np.linspace(0, T, steps)
+
+        a = integrators.integrate(self.__call__, (0, T), y0, eval, method,
+                                  profile, self._verlet_iterations,
+                                  rtol=rtol, atol=atol)
+        self.result = a
+
+        clear_cache(self)
+
+        # arrays have shape (N, len(t)), row k belongs to link k
+        self.t_array = a.t
+        self.theta_array = a.y[0::2]
+        self.omega_array = a.y[1::2]
+
+    def solve_ensemble(self, y0, T, dt, angles="rad", method="RK45",
+                       rtol=1e-3, atol=1e-6):
+
+        self.dt = dt
+
+        # y0 has one row (theta_1, omega_1, ..., theta_N, omega_N)
+        # per initial condition, shape (K, 2N)
+        y0 = np.array(y0, dtype=float)
+        if angles == "deg":
+            y0 = 180/np.pi * y0
+        k, n = y0.shape
+
+        # the state is stored as (2N, K) and flattened, so
+        # __call__ solves the systems of all members at once
+        def fun(t, y):
+            return self(t, y.reshape(n, k)).ravel()
+
+        steps = int(T/dt)
+        eval = np.linspace(0, T, steps)
+
+        a = scipy.integrate.solve_ivp(fun, (0, T), y0.T.ravel(), t_eval=eval,
+                                      method=method, rtol=rtol, atol=atol)
+
+        clear_cache(self)
+
+        # arrays have shape (N, K, len(t))
+        y = a.y.reshape(n, k, -1)
+        self.t_array = a.t
+        self.theta_array = y[0::2]
+        self.omega_array = y[1::2]
+
+    @property
+    def t(self):
+        return self.t_array
+
+    @property
+    def theta(self):
+        return self.theta_array
+
+    @property
+    def omega(self):
+        return self.omega_array
+
+    def _lengths(self):
+        # L[k] broadcast against the (N, ...) arrays
+        l = self._links()[1]
+        return l.reshape((-1,) + (1,)*(self.theta_array.ndim - 1))
+
+    def _masses(self):
+        m = self._links()[0]
+        return m.reshape((-1,) + (1,)*(self.theta_array.ndim - 1))
+
+    # positions of the masses, x[k] and y[k] belong to mass k
+    @functools.cached_property
+    def x(self):
+        return np.cumsum(self._lengths()*np.sin(self.theta_array), axis=0)
+
+    @functools.cached_property
+    def y(self):
+        return -np.cumsum(self._lengths()*np.cos(self.theta_array), axis=0)
+
+    @functools.cached_property
+    def potential(self):
+        # zero when the chain hangs straight down
+        g = 9.81
+        height = self.y + np.cumsum(self._lengths(), axis=0)
+        return g*np.sum(self._masses()*height, axis=0)
+
+    @functools.cached_property
+    def vx(self):
+        if self.velocity == "gradient":
+            return np.gradient(self.x, self.t_array, axis=-1)
+        vx = np.cos(self.theta_array)
+        vx *= self.omega_array
+        vx *= self._lengths()
+        return np.cumsum(vx, axis=0, out=vx)
+
+    @functools.cached_property
+    def vy(self):
+        if self.velocity == "gradient":
+            return np.gradient(self.y, self.t_array, axis=-1)
+        vy = np.sin(self.theta_array)
+        vy *= self.omega_array
+        vy *= self._lengths()
+        return np.cumsum(vy, axis=0, out=vy)
+
+    @functools.cached_property
+    def kinetic(self):
+        v2 = np.square(self.vx)
+        v2 += np.square(self.vy)
+        return 1/2*np.sum(self._masses()*v2, axis=0)
+
+
+if __name__ == "__main__":
+    u = NPendulum(M=1, L=(1, 0.8, 0.6, 0.4, 0.2))
+    u.solve(np.tile((1.5, 0), 5), 10, 0.01, method="DOP853", rtol=1e-8,
+            atol=1e-8)
+
+    plt.plot(u.x[-1], u.y[-1])
+    plt.title("Path of the last mass")
+    plt.axis("equal")
+    plt.show()
+
+    plt.plot(u.t, u.kinetic + u.potential)
+    plt.title("Total Amount of Energy")
+    plt.xlabel("Time [t]")
+    plt.ylabel("Energy [J]")
+    plt.show()
@@ -1,10 +1,20 @@
+import functools
 import scipy.integrate
+import scipy.special
 import numpy as np
 
 import matplotlib.pyplot as plt
 
+import integrators
+from cache import VelocityMethod, clear_cache
+
+
+class Pendulum(VelocityMethod):
+    # fixed-point iterations for the implicit half kick in
+    # the Verlet integrator, not needed when omega' only
+    # depends on theta
+    _verlet_iterations = 0
 
-class Pendulum:
     def __init__(self, M=1, L=1, g=9.81):
         self.M = M  # mass [kg]
         self.L = L  # length [m]
@@ -17,7 +27,9 @@ class Pendulum:
         # returns y' = (theta', omega')
         return (omega, -self.g/self.L*np.sin(theta))
 
-    def solve(self, y0, T, dt, angles="rad"):
+    def solve(self, y0, T, dt, angles="rad", method="RK45", rtol=1e-3,
+              atol=1e-6, profile=False, energy_drift=None,
+              dense_output=False):
 
         # option to convert
         # from radians to degrees
@@ -25,6 +37,16 @@ class Pendulum:
             y0[0] = 180/np.pi * y0[0]
             y0[1] = 180/np.pi * y0[1]
 
+        # with energy_drift the method and tolerances are chosen
+        # to keep the relative energy error below it, see
+        # integrators.tune
+        if energy_drift is not None:
+            settings = integrators.tune(self, y0, dt, energy_drift,
+                                        probe_T=min(T, 10))
+            method = settings["method"]
+            rtol = settings.get("rtol", rtol)
+            atol = settings.get("atol", atol)
+
         # function = (theta', omega')
         fun = self.__call__
         # time interval from 0 to T
@@ -33,15 +55,232 @@ class Pendulum:
         steps = int(T/dt)
         eval = np.linspace(0, T, steps)
 
-        # y0 = (theta_start, omega_start)
-        # eval specifies when to save values
-        # a returns an instance of a class
-        a = scipy.integrate.solve_ivp(fun, t_span, y0, t_eval=eval)
+        # with dense_output only the interpolant of the solution
+        # is kept in sol, the arrays are made by resample at the
+        # times that are needed. fixed steps still need eval
+        if dense_output and method not in integrators.FIXED_STEP_METHODS:
+            eval = None
+
+        if method == "exact":
+            self.result = None
+            if dense_output:
+                # the closed form is its own dense output
+                y0 = np.array(y0, dtype=float)
+                self.sol = lambda t: np.array(self.exact(y0, t))
+            else:
+                t = eval
+                y = self.exact(y0, eval)
+                self.sol = None
+        else:
+            # y0 = (theta_start, omega_start)
+            # eval specifies when to save values
+            # a returns an instance of a class
+            a = integrators.integrate(fun, t_span, y0, eval, method,
+                                      profile, self._verlet_iterations,
+                                      dense_output, rtol=rtol, atol=atol)
+            t, y = a.t, a.y
+            # result keeps the solver statistics (nfev, njev, nlu,
+            # status, message) and with profile=True also the calls,
+            # step sizes and throughput of the integration
+            self.result = a
+            self.sol = a.sol
+
+        clear_cache(self)
+
+        if dense_output:
+            for name in ("t_array", "theta_array", "omega_array"):
+                self.__dict__.pop(name, None)
+            return
+
+        self.t_array = t
+        # y = (theta_array, omega_array)
+        self.theta_array = y[0]
+        self.omega_array = y[1]
+
+    def resample(self, t):
+
+        # evaluates the solution of solve(..., dense_output=True)
+        # at the times t without integrating again, the arrays
+        # and derived quantities then belong to these times
+        if getattr(self, "sol", None) is None:
+            raise AttributeError("Solve must be called with "
+                                 "dense_output=True first")
+        t = np.asarray(t, dtype=float)
+        y = self.sol(t)
+
+        clear_cache(self)
+
+        self.t_array = t
+        self.theta_array = y[0]
+        self.omega_array = y[1]
+
+    def exact(self, y0, t):
+
+        # closed form solution of the undamped pendulum with
+        # jacobi elliptic functions, no integration needed.
+        # theta0 and omega0 in y0 may be arrays of initial
+        # values, theta and omega then get the shape
+        # np.shape(theta0) + np.shape(t)
+        theta0 = np.asarray(y0[0], dtype=float)[..., None]
+        omega0 = np.asarray(y0[1], dtype=float)[..., None]
+        t = np.asarray(t, dtype=float)
+
+        w = np.sqrt(self.g/self.L)
+
+        # m = k**2 is the energy in units of the energy
+        # needed to reach the top
+        m = np.sin(theta0/2)**2 + (omega0/(2*w))**2
+        k = np.sqrt(m)
+        rotating = m > 1
+        separatrix = m == 1
+
+        # libration, theta = 2*arcsin(k*sn(w*t + phi)) around the
+        # closest multiple of 2*pi. phi is chosen so that
+        # k*sn(phi) = sin(theta0/2) and 2*k*w*cn(phi) = omega0
+        m_lib = np.where(rotating | separatrix, 0, m)
+        center = 2*np.pi*np.round(theta0/(2*np.pi))
+        phi = scipy.special.ellipkinc(
+            np.arctan2(np.sin((theta0 - center)/2), omega0/(2*w)), m_lib)
+        sn, cn, dn, ph = scipy.special.ellipj(w*t + phi, m_lib)
+        theta = center + 2*np.arcsin(np.clip(k*sn, -1, 1))
+        omega = 2*k*w*cn
+
+        # rotation, theta = 2*am(k*w*t + psi | 1/m) in the
+        # direction of omega0
+        m_rot = np.where(rotating, 1/np.maximum(m, 1), 0)
+        s = np.where(omega0 < 0, -1, 1)
+        psi = scipy.special.ellipkinc(theta0/2, m_rot)
+        sn, cn, dn, ph = scipy.special.ellipj(s*k*w*t + psi, m_rot)
+        theta = np.where(rotating, 2*ph, theta)
+        omega = np.where(rotating, 2*s*k*w*dn, omega)
+
+        # separatrix, sin((theta - center)/2) = tanh(s*w*t + phi)
+        # approaches the top without reaching it. at the top
+        # itself, the inverted equilibrium, theta stays constant
+        top = separatrix & (omega0 == 0)
+        phi = np.arctanh(np.where(separatrix & ~top,
+                                  np.sin((theta0 - center)/2), 0))
+        x = s*w*t + phi
+        theta = np.where(separatrix, np.where(
+            top, theta0, center + 2*np.arcsin(np.tanh(x))), theta)
+        omega = np.where(separatrix, np.where(top, 0, 2*s*w/np.cosh(x)),
+                         omega)
+
+        return theta, omega
+
+    def period(self, y0):
+
+        # exact period of the undamped pendulum started at
+        # y0, for rotations the time of one full turn
+        theta0 = np.asarray(y0[0], dtype=float)
+        omega0 = np.asarray(y0[1], dtype=float)
+
+        w = np.sqrt(self.g/self.L)
+        m = np.sin(theta0/2)**2 + (omega0/(2*w))**2
+
+        with np.errstate(divide="ignore"):
+            libration = 4*scipy.special.ellipk(np.minimum(m, 1))/w
+            rotation = 2*scipy.special.ellipk(1/np.maximum(m, 1))/(
+                np.sqrt(m)*w)
+        return np.where(m > 1, rotation, libration)
+
+    def _ensemble(self, n):
+
+        # the state of an ensemble of n members is stored as
+        # (2, N, 1) and flattened, so __call__ broadcasts against
+        # the (N, 1) parameters
+        def fun(t, y):
+            return np.concatenate(self(t, y.reshape(2, n, 1))).ravel()
+
+        return fun
+
+    def solve_ensemble(self, y0, T, dt, angles="rad", method="RK45",
+                       rtol=1e-3, atol=1e-6):
+
+        # y0 has one row (theta, omega) per initial condition,
+        # shape (N, 2). the parameters M, L, g (and B) may be
+        # scalars or arrays of shape (N, 1), one value per member
+        y0 = np.array(y0, dtype=float)
+        if angles == "deg":
+            y0 = 180/np.pi * y0
 
+        n = len(y0)
+        fun = self._ensemble(n)
+
+        t_span = (0, T)
+
+        steps = int(T/dt)
+        eval = np.linspace(0, T, steps)
+
+        # the error is measured over the whole ensemble, so the
+        # tolerances may need to be tighter than for a single solve
+        a = scipy.integrate.solve_ivp(fun, t_span, y0.T.ravel(),
+                                      t_eval=eval, method=method,
+                                      rtol=rtol, atol=atol)
+
+        clear_cache(self)
+        self.sol = None
+
+        # arrays have shape (N, len(t))
+        y = a.y.reshape(2, n, -1)
         self.t_array = a.t
-        # a.y = (theta_array, omega_array)
-        self.theta_array = a.y[0]
-        self.omega_array = a.y[1]
+        self.theta_array = y[0]
+        self.omega_array = y[1]
+
+    def poincare(self, y0, T, direction=1, method="DOP853", rtol=1e-8,
+                 atol=1e-8):
+
+        # states where theta passes 0 (mod 2*pi), increasing with
+        # direction=1, for one initial condition or an ensemble of
+        # shape (N, 2) solved in one call. nothing but the crossings
+        # is stored, see integrators.poincare. returns the member
+        # index, time and state (theta, omega) of every crossing
+        y0 = np.atleast_2d(np.array(y0, dtype=float))
+        return integrators.poincare(self._ensemble(len(y0)), y0, T, 0,
+                                    direction, method, rtol=rtol, atol=atol)
+
+    @classmethod
+    def sweep(cls, y0, T, dt, method="RK45", rtol=1e-3, atol=1e-6,
+              **parameters):
+
+        # solves once for every value of the physical parameters
+        # given as keyword arrays, e.g.
+        #     DamperedPendulum.sweep((1, 0), 10, 0.01, B=B, L=L)
+        # the arrays are broadcast together and flattened to N
+        # members. returns an instance whose parameters are
+        # (N, 1) arrays and whose theta, omega, kinetic, ... are
+        # (N, len(t)) arrays, row i belonging to parameters[i]
+        values = np.broadcast_arrays(*(np.asarray(value, dtype=float)
+                                       for value in parameters.values()))
+        parameters = {name: value.reshape(-1, 1)
+                      for name, value in zip(parameters, values)}
+        n = values[0].size if values else 1
+
+        pendulum = cls(**parameters)
+        y0 = np.broadcast_to(np.asarray(y0, dtype=float), (n, 2))
+        pendulum.solve_ensemble(y0, T, dt, method=method, rtol=rtol,
+                                atol=atol)
+        return pendulum
+
+    def iter_solve(self, y0, T, dt, chunk=10000, angles="rad",
+                   method="RK45"):
+
+        # same time points as solve, but integrated and yielded
+        # in blocks of chunk points (t, theta, omega), so memory
+        # use does not grow with T
+        y0 = np.array(y0, dtype=float)
+        if angles == "deg":
+            y0 = 180/np.pi * y0
+
+        # with one point only t = 0 is yielded and with
+        # none nothing, like the arrays of solve
+        steps = int(T/dt)
+        h = T/(steps - 1) if steps > 1 else dt
+
+        blocks = integrators.iter_chunks(self.__call__, y0, h, steps, chunk,
+                                         method, self._verlet_iterations)
+        for t, y in blocks:
+            yield t, y[0], y[1]
 
     # properties returns the stored arrays
     # from solve, returns error if solve
@@ -70,41 +309,71 @@ class Pendulum:
             print("Solve must be called first")
             raise
 
-    @property
+    @functools.cached_property
     def x(self):
         x_value = self.L*np.sin(self.theta_array)
         return x_value
 
-    @property
+    @functools.cached_property
     def y(self):
         y_value = -self.L*np.cos(self.theta_array)
         return y_value
 
-    @property
+    @functools.cached_property
     def potential(self):
         return self.M*self.g*(self.y + self.L)
 
-    @property
+    @functools.cached_property
     def vx(self):
-        return np.gradient(self.x, self.t_array)
+        if self.velocity == "gradient":
+            return np.gradient(self.x, self.t_array, axis=-1)
+        # d/dt L*sin(theta) = L*cos(theta)*omega
+        vx = np.cos(self.theta_array)
+        vx *= self.omega_array
+        vx *= self.L
+        return vx
 
-    @property
+    @functools.cached_property
     def vy(self):
-        return np.gradient(self.y, self.t_array)
+        if self.velocity == "gradient":
+            return np.gradient(self.y, self.t_array, axis=-1)
+        vy = np.sin(self.theta_array)
+        vy *= self.omega_array
+        vy *= self.L
+        return vy
 
-    @property
+    @functools.cached_property
     def kinetic(self):
-        return 1/2*self.M*(self.vx**2+self.vy**2)
+        if self.velocity == "gradient":
+            return 1/2*self.M*(self.vx**2+self.vy**2)
+        # v**2 = (L*omega)**2
+        kinetic = np.square(self.omega_array)
+        kinetic *= 1/2*self.M*self.L**2
+        return kinetic
 
 
 class DamperedPendulum(Pendulum):
+    _verlet_iterations = 10
+
     def __init__(self, B, M=1, L=1, g=9.81):
         Pendulum.__init__(self, M, L, g)
         self.B = B
 
+    def solve(self, y0, T, dt, angles="rad", method="RK45", rtol=1e-3,
+              atol=1e-6, profile=False, energy_drift=None,
+              dense_output=False):
+        if energy_drift is not None and np.any(self.B != 0):
+            raise ValueError("The energy is not conserved with damping")
+        Pendulum.solve(self, y0, T, dt, angles, method, rtol, atol, profile,
+                       energy_drift, dense_output)
+
+    def exact(self, y0, t):
+        if np.any(self.B != 0):
+            raise ValueError("The closed form is only valid without damping")
+        return Pendulum.exact(self, y0, t)
+
     def __call__(self, t, y):
-        dtheta = Pendulum.__call__(self, t, y)[0]
-        domega = Pendulum.__call__(self, t, y)[1]
+        dtheta, domega = Pendulum.__call__(self, t, y)
         return (dtheta, domega - (self.B/self.M)*dtheta)
 
 
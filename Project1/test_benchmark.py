@@ -0,0 +1,30 @@
+import unittest
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_records(self):
+        grid = {"T": (2,), "dt": (0.1,), "rtol": (1e-3, 1e-6)}
+        records = list(benchmark.benchmark(grid, ["Pendulum"],
+                                           ["RK45", "Verlet"], repeat=1))
+        self.assertEqual(len(records), 3)
+        for record in records:
+            for field in ("wall_time", "nfev", "peak_memory", "error",
+                          "energy_drift"):
+                self.assertIn(field, record)
+        rk45 = [r for r in records if r["method"] == "RK45"]
+        self.assertGreater(rk45[1]["nfev"], rk45[0]["nfev"])
+        self.assertLess(rk45[1]["error"], rk45[0]["error"])
+
+    def test_compare(self):
+        old = {"model": "Pendulum", "method": "RK45", "T": 10, "dt": 0.1,
+               "rtol": 1e-3, "wall_time": 1.0, "nfev": 100, "error": 1e-3}
+        same = dict(old, wall_time=1.1)
+        slow = dict(old, wall_time=2.0, nfev=120)
+        self.assertEqual(benchmark.compare([old], [same]), [])
+        regressions = benchmark.compare([old], [slow])
+        self.assertEqual(regressions[0][2], ["wall_time", "nfev"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,13 @@
+import os
+import shutil
+import tempfile
 import numpy as np
+import matplotlib.pyplot as plt
 import pytest
+import scipy.integrate
 import unittest
 from double_pendulum import DoublePendulum
+from cache import clear_cache
 
 G = 9.81
 M1 = 1
@@ -148,6 +154,189 @@ class TestPendulum(unittest.TestCase):
             self.assertAlmostEqual(L1**2, R1power2)
             self.assertAlmostEqual(L2**2, R2power2)
 
+    def test_ensemble_matches_single(self):
+        y0 = [(1, 1, 1, 1), (0.5, 0, -0.5, 0), (0.2, 0.1, 0.3, 0)]
+        u = DoublePendulum()
+        u.solve_ensemble(y0, 5, 0.1)
+        self.assertEqual(u.theta1.shape, (3, 50))
+        self.assertEqual(u.kinetic.shape, (3, 50))
+        for i in range(3):
+            v = DoublePendulum()
+            v.solve(list(y0[i]), 5, 0.1)
+            np.testing.assert_allclose(u.theta1[i], v.theta1, atol=1e-2)
+            np.testing.assert_allclose(u.theta2[i], v.theta2, atol=1e-2)
+
+    def test_jacobian_finite_difference(self):
+        u = DoublePendulum(M1=1.3, L1=0.7, M2=0.8, L2=1.4)
+        y = np.array([0.4, -1.2, 2.1, 0.7])
+        h = 1e-6
+        J = u.jacobian(99, y)
+        for j in range(4):
+            e = np.zeros(4)
+            e[j] = h
+            column = (np.array(u(99, y + e)) - np.array(u(99, y - e)))/(2*h)
+            np.testing.assert_allclose(J[:, j], column, atol=1e-6)
+
+    def test_cache_cleared_on_solve(self):
+        u = DoublePendulum()
+        u.solve((1, 1, 1, 1), 5, 0.1)
+        first = u.kinetic
+        self.assertIs(first, u.kinetic)
+        self.assertIs(u.x1, u.x1)
+        u.solve((0.5, 0, 0.5, 0), 5, 0.1)
+        self.assertIsNot(first, u.kinetic)
+        np.testing.assert_allclose(u.x1, np.sin(u.theta1))
+
+    def test_exact_velocities(self):
+        u = DoublePendulum(M1=2, L1=0.5, M2=1, L2=1.5)
+        u.solve((1, 1, 1, 1), 5, 0.001, method="RK4")
+        K1 = 1/2*u.M1*(u.vx1**2 + u.vy1**2)
+        K2 = 1/2*u.M2*(u.vx2**2 + u.vy2**2)
+        np.testing.assert_allclose(u.kinetic, K1 + K2)
+        exact = u.kinetic
+        u.velocity = "gradient"
+        np.testing.assert_allclose(u.kinetic[1:-1], exact[1:-1],
+                                   atol=1e-3*np.max(exact))
+        with self.assertRaises(ValueError):
+            u.velocity = "spline"
+
+    def test_flip_time_map(self):
+        u = DoublePendulum()
+        theta = np.array([0.1, 2.5, 3])
+        flip_time = u.flip_time_map(theta, theta, 5, tile=2, processes=2)
+        self.assertEqual(flip_time.shape, (3, 3))
+        # small angles do not have the energy to flip
+        self.assertTrue(np.isnan(flip_time[0, 0]))
+        self.assertTrue(0 < flip_time[2, 2] < 5)
+
+        u.solve((3, 0, 3, 0), flip_time[2, 2], 0.001)
+        self.assertAlmostEqual(max(np.max(np.abs(u.theta1)),
+                                   np.max(np.abs(u.theta2))), np.pi, 2)
+
+    def test_export_frames(self):
+        u = DoublePendulum()
+        u.solve((1, 1, 1, 1), 1, 0.05)
+        with tempfile.TemporaryDirectory() as path:
+            filenames = u.export_frames(path, step=2, trail=5, processes=2,
+                                        size=2, dpi=50)
+            self.assertEqual(len(filenames), 10)
+            self.assertEqual(sorted(os.listdir(path)),
+                             [os.path.basename(f) for f in filenames])
+            image = plt.imread(filenames[3])
+            self.assertEqual(image.shape[:2], (100, 100))
+
+    @unittest.skipIf(shutil.which("ffmpeg") is None, "needs ffmpeg")
+    def test_export_video(self):
+        u = DoublePendulum()
+        u.solve((1, 1, 1, 1), 1, 0.05)
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, "pendulum.mp4")
+            u.export_video(filename, step=2, trail=5, processes=2)
+            self.assertGreater(os.path.getsize(filename), 0)
+
+    def test_lyapunov(self):
+        u = DoublePendulum()
+        regular, chaotic = u.lyapunov([(0.05, 0, 0.05, 0), (2, 0, 2, 0)], 50)
+        self.assertLess(abs(regular), 0.1)
+        self.assertGreater(chaotic, 0.5)
+        self.assertAlmostEqual(u.lyapunov((0.05, 0, 0.05, 0), 50), regular, 3)
+
+    def test_animation_from_dense_output(self):
+        u = DoublePendulum()
+        u.solve((1, 1, 1, 1), 2, 0.01, dense_output=True)
+        u.create_animation(fps=30)
+        self.assertEqual(len(u._frame_times), 60)
+        u._next_frame(45)
+        u.resample(u._frame_times[45:46])
+        x, y = u.pendulums.get_data()
+        self.assertAlmostEqual(x[2], u.x2[0])
+        self.assertAlmostEqual(y[2], u.y2[0])
+        plt.close("all")
+
+    def test_checkpoint_resume(self):
+        u = DoublePendulum()
+        u.solve((1, 1, 1, 1), 10, 0.01, method="RK45")
+
+        # a run that dies partway
+        v = DoublePendulum()
+        calls = []
+
+        def crash(t, y):
+            calls.append(t)
+            if len(calls) > 300:
+                raise RuntimeError("killed")
+            return DoublePendulum.__call__(v, t, y)
+
+        v.__call__ = crash
+        with tempfile.TemporaryDirectory() as path:
+            with self.assertRaises(RuntimeError):
+                v.solve((1, 1, 1, 1), 10, 0.01, method="RK45",
+                        checkpoint=path, checkpoint_interval=0)
+            w = DoublePendulum.resume(path)
+            np.testing.assert_array_equal(w.t, u.t)
+            np.testing.assert_array_equal(w.theta2, u.theta2)
+            np.testing.assert_array_equal(w.omega_array1, u.omega_array1)
+            self.assertLess(w.result.nfev, u.result.nfev)
+
+            # a finished run is only read back
+            x = DoublePendulum.resume(path)
+            self.assertEqual(x.result.nfev, 0)
+            np.testing.assert_array_equal(x.theta1, u.theta1)
+            del w, x
+
+    def test_extend(self):
+        y0 = (1, 1, 1, 1)
+        u = DoublePendulum()
+        u.solve(y0, 5, 0.01, rtol=1e-10, atol=1e-10)
+        spacing = u.t[1]
+        u.extend(10)
+        self.assertLessEqual(u.t[-1], 10)
+        np.testing.assert_allclose(np.diff(u.t), spacing)
+
+        reference = scipy.integrate.solve_ivp(u, (0, 10), y0, method="DOP853",
+                                              t_eval=u.t, rtol=1e-12,
+                                              atol=1e-12)
+        np.testing.assert_allclose(u.theta2, reference.y[2], atol=1e-6)
+        self.assertEqual(u.x2.shape, u.t.shape)
+
+        v = DoublePendulum()
+        v.solve(y0, 5, 0.01, method="RK45", rtol=1e-10, atol=1e-10,
+                dense_output=True)
+        v.extend(10)
+        v.resample(u.t)
+        np.testing.assert_allclose(v.theta2, reference.y[2], atol=1e-6)
+
+    def test_one_point(self):
+        # T < 2*dt gives only the initial state
+        for T in (0.1, 0.15):
+            u = DoublePendulum()
+            u.solve((1, 1, 1, 1), T, 0.1)
+            np.testing.assert_array_equal(u.t, [0])
+            np.testing.assert_array_equal(u.theta1, [1])
+            with self.assertRaises(ValueError):
+                u.extend(1)
+
+    def test_poincare(self):
+        u = DoublePendulum()
+        y0 = [(0.5, 0, 0.5, 0), (1, 0, 1.5, 0), (2, 0, 2, 0)]
+        index, t, states = u.poincare(y0, 20)
+        self.assertEqual(set(index), {0, 1, 2})
+        self.assertTrue(np.all(states[:, 1] > 0))
+        np.testing.assert_allclose(np.sin(states[:, 0]), 0, atol=1e-12)
+
+        # the energy at the crossings is the initial one
+        energy = []
+        for y in (np.array(y0)[index], states):
+            u.theta_array1, u.omega_array1 = y[:, 0], y[:, 1]
+            u.theta_array2, u.omega_array2 = y[:, 2], y[:, 3]
+            clear_cache(u)
+            energy.append(u.kinetic + u.potential)
+        np.testing.assert_allclose(energy[1], energy[0], rtol=1e-6)
+
+        single = DoublePendulum().poincare(y0[1], 20)
+        np.testing.assert_allclose(single[1], t[index == 1], atol=1e-6)
+        np.testing.assert_allclose(single[2], states[index == 1], atol=1e-5)
+
 
 if __name__ == '__main__':
     unittest.main()
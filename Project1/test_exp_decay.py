@@ -1,5 +1,7 @@
 import unittest
-from exp_decay import ExponentialDecay
+import numpy as np
+import scipy.linalg
+from exp_decay import ExponentialDecay, LinearDecay
 
 
 class TestExponentialDecay(unittest.TestCase):
@@ -9,6 +11,34 @@ class TestExponentialDecay(unittest.TestCase):
         calculated = test_value(99, 3.2)
         self.assertAlmostEqual(expected, calculated)
 
+    def test_exact_broadcast(self):
+        decay_model = ExponentialDecay(np.array([0.4, 1, 2]))
+        t, u = decay_model.exact(np.array([1, 10, 3]), 10, 0.1)
+        self.assertEqual(u.shape, (3, 101))
+        np.testing.assert_allclose(u[1], 10*np.exp(-t))
+        t2, u2 = ExponentialDecay(0.4).solve(1, 10, 0.1)
+        np.testing.assert_allclose(u[0], u2, rtol=1e-2)
+
+    def test_linear_decay(self):
+        A = np.array([[0.4, 0], [0, 2]])
+        decay_model = LinearDecay(A)
+        t, u = decay_model.solve([1, 3], 10, 0.1)
+        np.testing.assert_allclose(u[0], np.exp(-0.4*t))
+        np.testing.assert_allclose(u[1], 3*np.exp(-2*t), atol=1e-14)
+        self.assertEqual(len(decay_model._propagators), 1)
+
+    def test_linear_decay_coupled(self):
+        A = np.array([[1, -0.5], [0.3, 0.8]])
+        t, u = LinearDecay(A).solve(np.eye(2), 2, 0.5)
+        self.assertEqual(u.shape, (2, 2, 5))
+        np.testing.assert_allclose(u[..., -1], scipy.linalg.expm(-2*A))
+
+    def test_linear_decay_short(self):
+        t, u = LinearDecay([[0.4]]).solve([2], 0.05, 0.1)
+        t2, u2 = ExponentialDecay(0.4).solve(2, 0.05, 0.1)
+        np.testing.assert_array_equal(t, t2)
+        np.testing.assert_array_equal(u[0], u2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import numpy as np
+import scipy.integrate
+import integrators
+from pendulum import Pendulum, DamperedPendulum
+from double_pendulum import DoublePendulum
+from exp_decay import ExponentialDecay
+
+
+class TestIntegrators(unittest.TestCase):
+    def test_rk4_exponential_decay(self):
+        t = np.linspace(0, 5, 51)
+        out = integrators.fixed_step("RK4", ExponentialDecay(0.4), (2,), t)
+        expected = 2*np.exp(-0.4*t)
+        np.testing.assert_allclose(out[0], expected, rtol=1e-7)
+
+    def test_verlet_energy_bounded(self):
+        u = Pendulum(L=2)
+        u.solve((1, 0), 2000, 0.05, method="Verlet")
+        energy = (1/2*u.M*u.L**2*u.omega**2
+                  + u.M*u.g*u.L*(1 - np.cos(u.theta)))
+        drift = np.abs(energy - energy[0])/energy[0]
+        self.assertLess(np.max(drift), 1e-2)
+        # the error oscillates instead of growing
+        n = len(drift)//2
+        self.assertLess(np.max(drift[n:]), 1.5*np.max(drift[:n]))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            integrators.fixed_step("Euler", ExponentialDecay(1), (1,),
+                                   np.linspace(0, 1, 5))
+
+    def test_iter_solve_matches_solve(self):
+        u = Pendulum(L=2)
+        u.solve((1, 0), 20, 0.01, method="RK4")
+        blocks = list(u.iter_solve((1, 0), 20, 0.01, chunk=300,
+                                   method="RK4"))
+        self.assertEqual(len(blocks), 7)
+        self.assertTrue(all(len(b[0]) == 300 for b in blocks[:-1]))
+        t, theta, omega = (np.concatenate(b) for b in zip(*blocks))
+        np.testing.assert_allclose(t, u.t)
+        np.testing.assert_allclose(theta, u.theta, atol=1e-10)
+        np.testing.assert_allclose(omega, u.omega, atol=1e-10)
+
+    def test_iter_solve_double_pendulum(self):
+        u = DoublePendulum()
+        u.solve((1, 1, 1, 1), 3, 0.01)
+        blocks = list(u.iter_solve((1, 1, 1, 1), 3, 0.01, chunk=64))
+        t, theta1 = (np.concatenate(b) for b in list(zip(*blocks))[:2])
+        np.testing.assert_allclose(t, u.t)
+        np.testing.assert_allclose(theta1, u.theta1, atol=1e-2)
+
+    def test_iter_solve_short(self):
+        for T in (0.05, 0.1, 0.15):
+            u = Pendulum()
+            u.solve((1, 0), T, 0.1)
+            blocks = list(u.iter_solve((1, 0), T, 0.1))
+            t = [s for block in blocks for s in block[0]]
+            np.testing.assert_array_equal(t, u.t)
+            v = DoublePendulum()
+            blocks = list(v.iter_solve((1, 1, 1, 1), T, 0.1))
+            self.assertEqual(sum(len(b[0]) for b in blocks), len(u.t))
+
+    def test_integrate_matches_solve_ivp(self):
+        u = Pendulum()
+        t = np.linspace(0, 20, 200)
+        for method in integrators.SOLVERS:
+            a = scipy.integrate.solve_ivp(u, (0, 20), (1, 0), t_eval=t,
+                                          method=method)
+            b = integrators.integrate(u, (0, 20), (1, 0), t, method)
+            np.testing.assert_array_equal(a.t, b.t)
+            np.testing.assert_array_equal(a.y, b.y)
+            self.assertEqual((a.nfev, a.njev, a.nlu), (b.nfev, b.njev, b.nlu))
+
+    def test_profile(self):
+        u = Pendulum()
+        u.solve((1, 0), 20, 0.1, profile=True)
+        profile = u.result.profile
+        self.assertTrue(u.result.success)
+        self.assertEqual(profile["calls"], u.result.nfev)
+        self.assertAlmostEqual(np.sum(profile["h"]), 20)
+        self.assertTrue(all(r >= 0 for r in profile["rejected"]))
+        self.assertGreater(profile["throughput"], 0)
+
+        u.solve((1, 0), 20, 0.1, method="RK4", profile=True)
+        self.assertEqual(u.result.profile["calls"], 4*(len(u.t) - 1))
+
+        v = DoublePendulum()
+        v.solve((1, 1, 1, 1), 5, 0.1)
+        self.assertGreater(v.result.njev, 0)
+        self.assertNotIn("profile", v.result)
+
+    def test_fixed_step_nfev(self):
+        # the calls are counted without wrapping fun
+        t = np.linspace(0, 5, 51)
+        for model, y0 in ((Pendulum(), (1, 0)),
+                          (DoublePendulum(), (1, 1, 1, 1))):
+            for method in integrators.FIXED_STEP_METHODS:
+                a = integrators.integrate(model, (0, 5), y0, t, method,
+                                          iterations=3)
+                b = integrators.integrate(model, (0, 5), y0, t, method,
+                                          profile=True, iterations=3)
+                self.assertEqual(a.nfev, b.profile["calls"])
+                self.assertEqual(a.nfev, b.nfev)
+                np.testing.assert_array_equal(a.y, b.y)
+
+    def test_tune(self):
+        u = Pendulum(L=1.7)
+        u.solve((1, 0), 10, 0.01, energy_drift=1e-5)
+        self.assertLessEqual(integrators.energy_drift(u), 1e-5)
+        settings = integrators.tune(u, (1, 0), 0.01, 1e-5)
+        v = Pendulum(L=1.7)
+        v.solve((1, 0), 10, 0.01, **settings)
+        self.assertEqual(v.result.nfev, u.result.nfev)
+        # the second search is answered from the cache
+        self.assertIs(settings, integrators.tune(u, (0.2, 0), 0.01, 1e-5,
+                                                 methods=()))
+
+        with self.assertRaises(ValueError):
+            DamperedPendulum(B=0.2).solve((1, 0), 10, 0.01, energy_drift=1e-5)
+        with self.assertRaises(ValueError):
+            integrators.tune(Pendulum.sweep((1, 0), 1, 0.1, L=[1, 2]),
+                             (1, 0), 0.01, 1e-5)
+
+    def test_dense_output(self):
+        u = Pendulum()
+        t = np.linspace(0, 20, 200)
+        a = scipy.integrate.solve_ivp(u, (0, 20), (1, 0), dense_output=True)
+        b = integrators.integrate(u, (0, 20), (1, 0), None,
+                                  dense_output=True)
+        np.testing.assert_array_equal(a.t, b.t)
+        np.testing.assert_allclose(a.sol(t), b.sol(t), rtol=0, atol=1e-14)
+
+        # resampling gives the points solve would have given
+        for method in ("RK45", "Radau", "RK4", "exact"):
+            u.solve((1, 0), 20, 0.1, method=method)
+            v = Pendulum()
+            v.solve((1, 0), 20, 0.1, method=method, dense_output=True)
+            self.assertFalse(hasattr(v, "t_array"))
+            v.resample(u.t)
+            np.testing.assert_allclose(v.theta, u.theta, atol=1e-12)
+            np.testing.assert_allclose(v.kinetic, u.kinetic, atol=1e-12)
+
+        w = DoublePendulum()
+        w.solve((1, 1, 1, 1), 5, 0.1, dense_output=True)
+        w.resample(np.linspace(0, 5, 7))
+        self.assertEqual(w.x2.shape, (7,))
+        with self.assertRaises(AttributeError):
+            Pendulum().resample(t)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import numpy as np
+import unittest
+from n_pendulum import NPendulum
+from double_pendulum import DoublePendulum
+
+
+class TestNPendulum(unittest.TestCase):
+    def test_two_links_is_double_pendulum(self):
+        u = NPendulum(M=(1.3, 0.6), L=(0.7, 1.2))
+        v = DoublePendulum(M1=1.3, L1=0.7, M2=0.6, L2=1.2)
+        y = np.random.default_rng(1).normal(size=(4, 20))
+        np.testing.assert_allclose(u(0, y), v(0, y), atol=1e-12)
+        np.testing.assert_allclose(u(0, y[:, 3]), np.array(v(0, y))[:, 3],
+                                   atol=1e-12)
+
+        u.solve((1, 2, 3, 4), 5, 0.01)
+        v.solve((1, 2, 3, 4), 5, 0.01, method="RK45")
+        np.testing.assert_allclose(u.x[1], v.x2, atol=1e-12)
+        np.testing.assert_allclose(u.y[0], v.y1, atol=1e-12)
+        np.testing.assert_allclose(u.kinetic, v.kinetic, atol=1e-10)
+        np.testing.assert_allclose(u.potential, v.potential, atol=1e-10)
+
+    def test_rest(self):
+        u = NPendulum(M=1, L=np.ones(10))
+        u.solve(np.zeros(20), 5, 0.1)
+        np.testing.assert_array_equal(u.theta, 0)
+        np.testing.assert_allclose(u.y[-1], -10)
+        np.testing.assert_allclose(u.potential, 0, atol=1e-12)
+
+    def test_energy_conserved(self):
+        u = NPendulum(M=(1, 2, 1, 0.5, 1), L=(1, 0.8, 0.6, 0.4, 0.2))
+        u.solve(np.tile((1.5, 0), 5), 10, 0.01, method="DOP853", rtol=1e-10,
+                atol=1e-10)
+        energy = u.kinetic + u.potential
+        self.assertLess(np.ptp(energy)/energy[0], 1e-7)
+
+    def test_ensemble_matches_single(self):
+        y0 = np.random.default_rng(2).normal(scale=0.5, size=(4, 6))
+        u = NPendulum()
+        u.solve_ensemble(y0, 2, 0.01, rtol=1e-10, atol=1e-10)
+        self.assertEqual(u.x.shape, (3, 4, len(u.t)))
+        self.assertEqual(u.kinetic.shape, (4, len(u.t)))
+        for i in range(len(y0)):
+            v = NPendulum()
+            v.solve(y0[i], 2, 0.01, rtol=1e-10, atol=1e-10)
+            np.testing.assert_allclose(u.theta[:, i], v.theta, atol=1e-7)
+            np.testing.assert_allclose(u.kinetic[i], v.kinetic, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
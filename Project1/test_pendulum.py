@@ -1,6 +1,7 @@
 import unittest
 import numpy as np
-from pendulum import Pendulum
+import scipy.integrate
+from pendulum import Pendulum, DamperedPendulum
 
 
 class TestPendulum(unittest.TestCase):
@@ -60,6 +61,99 @@ class TestPendulum(unittest.TestCase):
             radiuspower2 = (x[i])**2 + (y[i])**2
             self.assertAlmostEqual(L**2, radiuspower2)
 
+    def test_cache_cleared_on_solve(self):
+        u = Pendulum(L=3.4)
+        u.solve((1, 1), 10, 1)
+        potential = u.potential
+        self.assertIs(potential, u.potential)
+        u.solve((0, 0), 10, 1)
+        self.assertIsNot(potential, u.potential)
+        np.testing.assert_allclose(u.potential, 0, atol=1e-12)
+
+    def test_exact_kinetic(self):
+        u = Pendulum(M=2, L=3.4)
+        u.solve((1, 1), 10, 0.001, method="RK4")
+        np.testing.assert_allclose(u.kinetic,
+                                   1/2*u.M*(u.vx**2 + u.vy**2))
+        exact = u.kinetic
+        u.velocity = "gradient"
+        np.testing.assert_allclose(u.kinetic[1:-1], exact[1:-1],
+                                   atol=1e-3*np.max(exact))
+
+    def test_exact_matches_integration(self):
+        u = Pendulum(L=2.3)
+        t = np.linspace(0, 20, 201)
+        for y0 in [(1, 0), (-2, 1), (0.5, 5), (7, -0.5)]:
+            theta, omega = u.exact(y0, t)
+            a = scipy.integrate.solve_ivp(u, (0, 20), y0, t_eval=t,
+                                          rtol=1e-11, atol=1e-11)
+            np.testing.assert_allclose(theta, a.y[0], atol=1e-7)
+            np.testing.assert_allclose(omega, a.y[1], atol=1e-7)
+
+        # on the separatrix the integration leaves the unstable
+        # top after a while, so it is only compared shortly
+        w = np.sqrt(u.g/u.L)
+        t = np.linspace(0, 3, 31)
+        for y0 in [(np.pi, 0), (-np.pi, 0), (0, 2*w), (1, -2*w*np.cos(0.5))]:
+            theta, omega = u.exact(y0, t)
+            a = scipy.integrate.solve_ivp(u, (0, 3), y0, t_eval=t,
+                                          rtol=1e-11, atol=1e-11)
+            np.testing.assert_allclose(theta, a.y[0], atol=1e-7)
+            np.testing.assert_allclose(omega, a.y[1], atol=1e-7)
+        self.assertEqual(u.period((np.pi, 0)), np.inf)
+
+    def test_exact_period(self):
+        u = Pendulum(L=3.4)
+        amplitudes = np.array([1e-4, 0.5, 1, 2, 3])
+        period = u.period((amplitudes, 0))
+        self.assertAlmostEqual(period[0], 2*np.pi*np.sqrt(u.L/u.g))
+        self.assertTrue(np.all(np.diff(period) > 0))
+        theta, omega = u.exact((amplitudes, 0), [0, 0, 0])
+        self.assertEqual(theta.shape, (5, 3))
+        for i in range(5):
+            theta, omega = u.exact((amplitudes[i], 0), [period[i]])
+            self.assertAlmostEqual(theta[0], amplitudes[i])
+
+    def test_exact_dampered(self):
+        u = DamperedPendulum(B=0.2)
+        with self.assertRaises(ValueError):
+            u.solve((1, 0), 10, 0.1, method="exact")
+
+    def test_sweep(self):
+        B = np.array([0, 0.2, 1])
+        u = DamperedPendulum.sweep((1, 0), 10, 0.1, rtol=1e-9, atol=1e-9,
+                                   B=B, L=[[2], [3]])
+        self.assertEqual(u.theta.shape, (6, 100))
+        self.assertEqual(u.L.shape, (6, 1))
+        for i in range(6):
+            v = DamperedPendulum(B=u.B[i, 0], L=u.L[i, 0])
+            a = scipy.integrate.solve_ivp(v, (0, 10), (1, 0), t_eval=u.t,
+                                          rtol=1e-9, atol=1e-9)
+            np.testing.assert_allclose(u.theta[i], a.y[0], atol=1e-6)
+            np.testing.assert_allclose(u.omega[i], a.y[1], atol=1e-6)
+        # more damping loses more energy
+        energy = u.kinetic + u.potential
+        self.assertTrue(np.all(np.diff(energy[:3, -1]) < 0))
+
+    def test_poincare(self):
+        u = Pendulum(L=2)
+        y0 = [(0.5, 0), (1, 0), (2.5, 0), (1, 8)]
+        index, t, states = u.poincare(y0, 30)
+        self.assertTrue(np.all(np.diff(t) >= 0))
+        self.assertTrue(np.all(states[:, 1] > 0))
+        np.testing.assert_allclose(np.sin(states[:, 0]), 0, atol=1e-12)
+        for i in range(len(y0)):
+            times = t[index == i]
+            self.assertGreater(len(times), 2)
+            np.testing.assert_allclose(np.diff(times), u.period(y0[i]),
+                                       rtol=1e-6)
+
+        # damping takes energy out between the crossings
+        h = DamperedPendulum(B=0.1)
+        index, t, states = h.poincare((1, 0), 30)
+        self.assertTrue(np.all(index == 0))
+        self.assertTrue(np.all(np.diff(states[:, 1]) < 0))
+
 
 if __name__ == '__main__':
     unittest.main()
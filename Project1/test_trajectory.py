@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from pendulum import DamperedPendulum
+from double_pendulum import DoublePendulum
+from trajectory import save_trajectory, load_trajectory
+
+
+class TestTrajectory(unittest.TestCase):
+    def test_round_trip(self):
+        u = DoublePendulum(M1=2, L2=1.5)
+        u.solve((1, 1, 1, 1), 10, 0.1)
+        with tempfile.TemporaryDirectory() as path:
+            save_trajectory(u, path)
+            v = load_trajectory(path)
+            self.assertIsInstance(v, DoublePendulum)
+            self.assertEqual((v.M1, v.L2, v.dt), (2, 1.5, 0.1))
+            self.assertIsInstance(v.theta_array1, np.memmap)
+            np.testing.assert_array_equal(v.t, u.t)
+            np.testing.assert_allclose(v.kinetic, u.kinetic)
+            np.testing.assert_allclose(v.x2, u.x2)
+            del v
+
+    def test_time_window(self):
+        u = DamperedPendulum(B=0.2, L=2)
+        u.solve((1, 0), 10, 0.01)
+        with tempfile.TemporaryDirectory() as path:
+            save_trajectory(u, os.path.join(path, "run"))
+            v = load_trajectory(os.path.join(path, "run"), 2, 3)
+            self.assertEqual(v.B, 0.2)
+            self.assertTrue(np.all((v.t >= 2) & (v.t < 3)))
+            mask = (u.t >= 2) & (u.t < 3)
+            np.testing.assert_allclose(v.potential, u.potential[mask])
+            del v
+
+    def test_sweep(self):
+        u = DamperedPendulum.sweep((1, 0), 1, 0.1, B=[0, 0.1], L=np.int64(2))
+        with tempfile.TemporaryDirectory() as path:
+            save_trajectory(u, path)
+            v = load_trajectory(path)
+            np.testing.assert_array_equal(v.B, u.B)
+            np.testing.assert_allclose(v.kinetic, u.kinetic)
+            del v
+
+            # a parameter that cannot be stored writes nothing
+            u.M = {1}
+            with self.assertRaises(TypeError):
+                save_trajectory(u, os.path.join(path, "bad"))
+            self.assertFalse(os.path.exists(os.path.join(path, "bad")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import os
+
+import numpy as np
+
+import integrators
+from pendulum import Pendulum, DamperedPendulum
+from double_pendulum import DoublePendulum
+
+
+# the arrays stored by solve for each class, one .npy file each
+COLUMNS = {
+    Pendulum: ("t_array", "theta_array", "omega_array"),
+    DoublePendulum: ("t_array", "theta_array1", "omega_array1",
+                     "theta_array2", "omega_array2"),
+}
+
+CLASSES = {cls.__name__: cls
+           for cls in (Pendulum, DamperedPendulum, DoublePendulum)}
+
+
+def _columns(cls):
+    for base in cls.__mro__:
+        if base in COLUMNS:
+            return COLUMNS[base]
+    raise TypeError(f"Cannot store trajectories of {cls.__name__}")
+
+
+def save_trajectory(pendulum, path):
+    # writes a solved pendulum to the directory path, with one raw
+    # .npy file per array and the class and its parameters in
+    # meta.json
+    cls = type(pendulum)
+    columns = _columns(cls)
+
+    # numpy values, such as the (N, 1) parameter arrays
+    # of a sweep, are stored as (nested) lists
+    meta = {"class": cls.__name__,
+            "parameters": {name: np.asarray(value).tolist() for name, value
+                           in integrators.parameters(pendulum)},
+            "columns": list(columns)}
+    if hasattr(pendulum, "dt"):
+        meta["dt"] = np.asarray(pendulum.dt).tolist()
+
+    # meta is serialized before anything is written, so a value
+    # that cannot be stored leaves no half-written directory
+    meta = json.dumps(meta)
+
+    os.makedirs(path, exist_ok=True)
+    for column in columns:
+        np.save(os.path.join(path, column + ".npy"),
+                np.ascontiguousarray(getattr(pendulum, column)))
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        f.write(meta)
+
+
+def load_trajectory(path, t_start=None, t_stop=None):
+    # returns a new instance of the stored class with the arrays
+    # memory-mapped from disk, only the samples with
+    # t_start <= t < t_stop are read when they are used
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+
+    parameters = {name: np.array(value) if isinstance(value, list) else value
+                  for name, value in meta["parameters"].items()}
+    pendulum = CLASSES[meta["class"]](**parameters)
+    if "dt" in meta:
+        pendulum.dt = meta["dt"]
+
+    arrays = {column: np.load(os.path.join(path, column + ".npy"),
+                              mmap_mode="r")
+              for column in meta["columns"]}
+
+    # t is sorted, so the window is found by binary search
+    # and only touches a few pages of the file
+    t = arrays["t_array"]
+    start = 0 if t_start is None else np.searchsorted(t, t_start)
+    stop = t.shape[-1] if t_stop is None else np.searchsorted(t, t_stop)
+
+    for column, array in arrays.items():
+        setattr(pendulum, column, array[..., start:stop])
+
+    return pendulum
@@ -1,4 +1,8 @@
+import functools
+import multiprocessing
+import os
 import numpy as np
+import scipy.signal
 import matplotlib.pyplot as plt
 
 class ChaosGame():
@@ -56,24 +60,146 @@ class ChaosGame():
         """Plots corners of n-gon"""
         plt.scatter(*zip(*self.c), c="black")
 
-    def _starting_point(self):
+    def _starting_point(self, rng=None):
         """Calculates random starting point.
 
         Uses random weights to calculate a random
         starting point.
 
+        Parameters
+        ----------
+        rng: Generator
+            Random generator to draw the weights from,
+            defaulted to the global random state: None
+
         Returns
         -------
         X0: array
             Random starting point
         """
-        weights = np.random.random(size=self.n)
+        random = np.random.random if rng is None else rng.random
+        weights = random(size=self.n)
         weights = weights/sum(weights)
 
         X0 = np.matmul(weights, self.c)
 
         return X0
 
+    def _corner_indices(self, iterations, chunk=1 << 18, rng=None):
+        """Draws the corner indexes of the given number of iterations.
+
+        Gives the same indexes and leaves the global random
+        state the same as calling np.random.random(size=n)
+        followed by np.random.randint(0, n) once per iteration,
+        but the random words are drawn in bulk, about as many
+        as the iterations need. A given random generator is
+        used directly instead.
+
+        Parameters
+        ----------
+        iterations: int
+            Number of corner indexes
+        chunk: int
+            Largest number of random 32 bit words drawn at a time
+        rng: Generator
+            Random generator to draw the indexes from,
+            defaulted to the global random state: None
+
+        Returns
+        -------
+        corners: array
+            Contains integers
+        """
+        n = self.n
+        if rng is not None:
+            return rng.integers(0, n, size=iterations)
+
+        # np.random.random(size=n) uses two 32 bit words per
+        # number, np.random.randint(0, n) masks one word with the
+        # smallest mask 2**k - 1 >= n - 1 and draws again until
+        # the masked word is at most n - 1
+        skip = 2*n
+        mask = (1 << (n - 1).bit_length()) - 1
+        per_iteration = skip + (mask + 1)/n
+        jumps = 8
+
+        corners = np.empty(iterations, dtype=int)
+        done = 0
+        words = np.empty(0, dtype=np.uint32)
+        while done < iterations:
+            # enough words for the remaining iterations with a margin
+            # for the rejected ones, but at most chunk at a time. the
+            # words after the last complete iteration are kept
+            left = iterations - done
+            draw = min(int(per_iteration*(left + 4*np.sqrt(left))) + skip + 1,
+                       chunk)
+            carried = len(words)
+            state = np.random.get_state()
+            drawn = np.random.randint(0, 2**32, size=draw, dtype=np.uint32)
+            words = np.concatenate((words, drawn)) if carried else drawn
+            size = len(words)
+            need = min(left, size//(skip + 1))
+
+            # without rejections every iteration uses skip + 1 words
+            if mask == n - 1:
+                ends = (skip + 1)*np.arange(need) + skip
+                corners[done:done + need] = np.take(words, ends) & mask
+                done += need
+                used = ends[-1] + 1 if need else 0
+                words = words[used:]
+                continue
+
+            # accepted words, followed by skip words that are not
+            accepted = np.zeros(size + skip, dtype=bool)
+            np.less_equal(words & mask, n - 1, out=accepted[:size])
+            indexes = np.flatnonzero(accepted).astype(np.int32)
+            m = len(indexes)
+            if skip < 256:
+                accepted = accepted.view(np.uint8)
+            else:
+                accepted = accepted.astype(np.uint16)
+
+            # an iteration that ends with accepted word i is followed
+            # by one that ends with accepted word after[i], the first
+            # one at least skip + 1 words later. so after[i] is i + 1
+            # plus the accepted words among the next skip words. m
+            # means out of words
+            after = np.empty(m + 1, dtype=np.int32)
+            np.add(np.take(_window_sums(accepted[1:], skip), indexes),
+                   np.arange(1, m + 1, dtype=np.int32), out=after[:m])
+            after[m] = m
+            after_jumps = after
+            for _ in range(jumps.bit_length() - 1):
+                after_jumps = np.take(after_jumps, after_jumps)
+
+            # only every jumps-th iteration is found one at a time,
+            # the ones in between are filled in together
+            ends = np.empty((jumps, (need - 1)//jumps + 1), dtype=np.int32)
+            i = int(np.searchsorted(indexes, skip))
+            lookup = memoryview(after_jumps)
+            walk = []
+            for _ in range(ends.shape[1]):
+                walk.append(i)
+                i = lookup[i]
+            ends[0] = walk
+            for j in range(1, jumps):
+                np.take(after, ends[j - 1], out=ends[j])
+            ends = ends.T.ravel()[:need]
+            ends = np.take(indexes, ends[:np.searchsorted(ends, m)])
+
+            corners[done:done + len(ends)] = np.take(words, ends) & mask
+            done += len(ends)
+            used = ends[-1] + 1 if len(ends) else 0
+            words = words[used:]
+
+        # the words drawn after the last complete iteration
+        # are given back to the global random state
+        if iterations:
+            np.random.set_state(state)
+            np.random.randint(0, 2**32, size=used - carried, dtype=np.uint32)
+
+        return corners
+
     def iterate(self, steps, discard=5):
         """Iterates chaos game for n-gon.
 
@@ -82,6 +208,12 @@ class ChaosGame():
         Iterates again, storing coordinates
         and corner indexes in arrays.
 
+        The corner indexes are drawn in bulk and the
+        points X_{k+1} = r*X_k + (1 - r)*c_j are computed
+        as a first order linear filter over the corners,
+        which gives the same values as iterating one
+        point at a time.
+
         Parameters
         ----------
         steps: int
@@ -91,34 +223,247 @@ class ChaosGame():
         """
         X0 = self._starting_point()
 
-        for i in range(discard):
-            weights = np.random.random(size=self.n)
-            weights = weights/sum(weights)
+        corners = self._corner_indices(discard + steps)
+        r = self.r
+        x_values, _ = scipy.signal.lfilter([1 - r], [1, -r],
+                                           np.take(np.transpose(self.c),
+                                                   corners, axis=1),
+                                           zi=np.transpose([r*X0]))
+
+        self.x_values = x_values.T[discard:]
+        self.colors = corners[discard:].astype(float)
+        # the gradient colors of the previous points are outdated
+        vars(self).pop("gradient_color", None)
+
+    def iter_chunks(self, chunk_size, total=None, discard=5, rng=None,
+                    block=1 << 16):
+        """Iterates chaos game for n-gon one chunk at a time.
+
+        The last point and the gradient color are carried
+        from one block of iterations to the next, so joining
+        the chunks gives the points, colors and gradient colors
+        of iterate(total). Small chunks are cut from blocks of
+        at least block iterations, so the cost per point does
+        not depend on chunk_size. Only one block is kept in
+        memory, and without a total the iterations never stop.
+
+        Parameters
+        ----------
+        chunk_size: int
+            Number of iterations per chunk
+        total: int
+            Number of iterations that are yielded,
+            defaulted to no end: None
+        discard: int
+            Discarded iterations, defaulted to 5
+        rng: Generator
+            Random generator of the chain, defaulted
+            to the global random state: None
+        block: int
+            Least number of iterations computed at a time,
+            defaulted to 2**16
+
+        Yields
+        ------
+        points: array
+            Contains coordinates, shape (iterations, 2)
+        corners: array
+            Contains the corner index of each iteration
+        gradient_colors: array
+            Contains the gradient color values
+
+        Raises
+        ------
+        ValueError
+            If chunk_size is not positive
+
+        Warnings
+        --------
+        The random state is up to a block ahead of the
+        yielded chunks, it is only the one of iterate(total)
+        after the last chunk
+        """
+        if chunk_size <= 0:
+            raise(ValueError)
+        # a whole number of chunks per block
+        block = chunk_size*max(1, -(-block//chunk_size))
+
+        r = self.r
+        corners_T = np.transpose(self.c)
+        X0 = self._starting_point(rng)
+
+        # the filter states are r*X_k and half the gradient color
+        zi = np.transpose([r*X0])
+        zi_gradient = None
+        skip = discard
+        done = 0
+        while total is None or done < total:
+            size = block if total is None else min(block, total - done)
+            corners = self._corner_indices(skip + size, rng=rng)
+            points, zi = scipy.signal.lfilter([1 - r], [1, -r],
+                                              np.take(corners_T, corners,
+                                                      axis=1), zi=zi)
+            points = points.T[skip:]
+            corners = corners[skip:]
+            skip = 0
+
+            gradient, zi_gradient = _gradient(corners, zi_gradient)
+            done += size
+            for start in range(0, size, chunk_size):
+                stop = start + chunk_size
+                yield (points[start:stop], corners[start:stop],
+                       gradient[start:stop])
+
+    def density(self, resolution=1000, color=False):
+        """Accumulates the points in a density histogram.
+
+        The grid covers the bounding box of the n-gon.
+
+        Parameters
+        ----------
+        resolution: int
+            Number of pixels along the longest side
+        color: bool
+            Decides if the gradient colors are averaged
+            per pixel. Defaulted to no color: False
+
+        Returns
+        -------
+        histogram: DensityHistogram
+            Contains the point counts of the pixels
+
+        Raises
+        ------
+        AttributeError
+            If the iterate() method has not been called beforehand
+        """
+        histogram = DensityHistogram.around(self.c, resolution)
+        histogram.add(self.x_values,
+                      self.gradient_color if color else None)
+        return histogram
 
-            j = np.random.randint(0, self.n)
-            corner = self.c[j]
+    def _parallel(self, steps, workers, seed, discard, buffers, grid):
+        """Runs one independent chain per worker process.
 
-            xp = self.r*X0 + (1 - self.r)*corner
-            X0 = xp
+        The child seeds are spawned from one SeedSequence and
+        chain i gives iterations sum(counts[:i]) to
+        sum(counts[:i + 1]), so the result only depends on
+        the seed and the number of workers.
 
-        x_values = np.zeros([steps, 2])
-        colors = np.zeros(steps)
+        Parameters
+        ----------
+        steps: int
+            Number of iterations that are stored
+        workers: int
+            Number of chains and worker processes
+        seed: int or SeedSequence
+            Seed of the chains
+        discard: int
+            Discarded iterations of each chain
+        buffers: dict
+            Contains the shared arrays the chains write to
+        grid: tuple
+            Extent and shape of the density histogram,
+            or None to store the points
+        """
+        children = np.random.SeedSequence(seed).spawn(workers)
+        counts = np.full(workers, steps//workers)
+        counts[:steps % workers] += 1
+        stops = np.cumsum(counts)
+        tasks = [(self.n, self.r, children[i], i, stops[i] - counts[i],
+                  stops[i], discard, grid) for i in range(workers)]
+
+        with multiprocessing.Pool(workers, _share, (buffers,)) as pool:
+            pool.starmap(_chain, tasks)
+
+    def iterate_parallel(self, steps, workers=None, seed=None, discard=5):
+        """Iterates chaos game for n-gon in parallel.
+
+        Every worker process runs its own chain with its own
+        starting point, discarded iterations and random
+        generator, and writes its points into shared memory.
+        The points of the chains are stored one after the
+        other like the ones of iterate(), and the result is
+        the same for the same seed and number of workers.
 
-        for i in range(steps):
-            weights = np.random.random(size=self.n)
-            weights = weights/sum(weights)
+        Parameters
+        ----------
+        steps: int
+            Number of iterations that are stored
+        workers: int
+            Number of chains and worker processes,
+            defaulted to the number of cpus: None
+        seed: int or SeedSequence
+            Seed of the chains, defaulted to fresh
+            entropy: None
+        discard: int
+            Discarded iterations of each chain, defaulted to 5
 
-            j = np.random.randint(0, self.n)
-            corner = self.c[j]
-            colors[i] = j
+        Warnings
+        --------
+        The gradient colors run on from one chain into the next
+        """
+        workers = workers or os.cpu_count()
+        points = multiprocessing.RawArray("d", 2*steps)
+        colors = multiprocessing.RawArray("d", steps)
+        self._parallel(steps, workers, seed, discard,
+                       {"points": points, "colors": colors}, None)
 
-            x_values[i] = self.r*X0 + (1 - self.r)*corner
-            X0 = x_values[i]
+        self.x_values = np.frombuffer(points).reshape(steps, 2)
+        self.colors = np.frombuffer(colors)
+        vars(self).pop("gradient_color", None)
 
-        self.x_values = x_values
-        self.colors = colors
+    def density_parallel(self, steps, resolution=1000, color=False,
+                         workers=None, seed=None, discard=5):
+        """Accumulates parallel chains in a density histogram.
 
-    def plot(self, color=False, cmap="jet"):
+        Every worker process runs its own chain like in
+        iterate_parallel(), but only fills its own grid of
+        the histogram in shared memory, so no points are kept.
+        The grids are summed in the order of the chains.
+
+        Parameters
+        ----------
+        steps: int
+            Number of iterations that are counted
+        resolution: int
+            Number of pixels along the longest side
+        color: bool
+            Decides if the gradient colors are averaged
+            per pixel. Defaulted to no color: False
+        workers: int
+            Number of chains and worker processes,
+            defaulted to the number of cpus: None
+        seed: int or SeedSequence
+            Seed of the chains, defaulted to fresh
+            entropy: None
+        discard: int
+            Discarded iterations of each chain, defaulted to 5
+
+        Returns
+        -------
+        histogram: DensityHistogram
+            Contains the point counts of the pixels
+        """
+        workers = workers or os.cpu_count()
+        histogram = DensityHistogram.around(self.c, resolution)
+        size = workers*histogram.counts.size
+        counts = multiprocessing.RawArray("q", size)
+        color_sums = multiprocessing.RawArray("d", size if color else 0)
+        self._parallel(steps, workers, seed, discard,
+                       {"counts": counts, "color_sums": color_sums},
+                       (histogram.extent, histogram.shape))
+
+        shape = (workers,) + histogram.shape
+        histogram.counts = np.frombuffer(counts, np.int64).reshape(shape)
+        histogram.counts = histogram.counts.sum(axis=0)
+        if color:
+            color_sums = np.frombuffer(color_sums).reshape(shape)
+            for grid in color_sums:
+                histogram.color_sums += grid
+        return histogram
+
+    def plot(self, color=False, cmap="jet", density=False, resolution=1000):
         """Plots chaos game iterations.
 
         Parameters
@@ -129,6 +474,14 @@ class ChaosGame():
         cmap: str
             A colormap corresponding to a defined colormap
             in matplolib
+        density: bool
+            Decides if the points are drawn as a log-scaled
+            density image instead of one marker per point,
+            which does not slow down with the number of points.
+            Defaulted to markers: False
+        resolution: int
+            Number of pixels along the longest side of the
+            density image
 
         Raises
         ------
@@ -144,16 +497,25 @@ class ChaosGame():
         Colormaps can be found here:
             https://matplotlib.org/3.1.0/tutorials/colors/colormaps.html
         """
+        self.plot_ngon()
+        if density:
+            histogram = self.density(resolution, color)
+            plt.imshow(histogram.image(cmap if color else None,
+                                       vmin=0, vmax=self.n - 1),
+                       extent=histogram.extent, origin="lower",
+                       interpolation="nearest")
+            plt.axis("equal")
+            return
+
         if color:
             colors = self.gradient_color
         else:
             colors = "black"
 
-        self.plot_ngon()
         plt.scatter(*zip(*self.x_values), c=colors, cmap=cmap, s=0.1)
         plt.axis("equal")
 
-    def show(self, color=False, cmap="jet"):
+    def show(self, color=False, cmap="jet", density=False):
         """Presents the plot.
 
         Calls on the plot() method and shows
@@ -167,17 +529,21 @@ class ChaosGame():
         cmap: str
             A colormap corresponding to a defined colormap
             in matplolib
+        density: bool
+            Decides if the points are drawn as a density
+            image. Defaulted to markers: False
         """
-        self.plot(color, cmap)
+        self.plot(color, cmap, density)
         plt.show()
 
-    @property
+    @functools.cached_property
     def gradient_color(self):
         """Adds a gradient color to plot.
 
         Uses list of corner indexes to
         calculate array of gradient color
-        values.
+        values. They are computed once per
+        call of iterate().
 
         Returns
         ------
@@ -193,18 +559,10 @@ class ChaosGame():
         --------
         Calling the iterate() method beforehand is required
         """
-        colors = self.colors
-        length = len(colors)
-
-        color_array = np.zeros(length)
-        color_array[0] = colors[0]
-
-        for i in range(length-1):
-            color_array[i+1] = (color_array[i]+colors[i+1])/2
-
+        color_array, _ = _gradient(self.colors)
         return color_array
 
-    def savepng(self, outfile, color=False, cmap="jet"):
+    def savepng(self, outfile, color=False, cmap="jet", density=False):
         """Saves the image as png format.
 
         Parameters
@@ -217,6 +575,9 @@ class ChaosGame():
         cmap: str
             A colormap corresponding to a defined colormap
             in matplolib
+        density: bool
+            Decides if the points are drawn as a density
+            image. Defaulted to markers: False
 
         Raises
         ------
@@ -230,10 +591,280 @@ class ChaosGame():
             raise(TypeError)
         elif filename[-1] == "png":
             filename = outfile
-        self.plot(color, cmap)
+        self.plot(color, cmap, density)
         plt.savefig(filename, dpi=300, transparent=False)
 
 
+def _window_sums(a, width):
+    """Sums of width consecutive values.
+
+    The sums are built from ones of widths 1, 2, 4, ...,
+    so a only is passed over about log2(width) times.
+
+    Parameters
+    ----------
+    a: array
+        Contains the values
+    width: int
+        Number of values per sum
+
+    Returns
+    -------
+    sums: array
+        Contains a[i] + ... + a[i + width - 1] for each i
+        from 0 to len(a) - width
+    """
+    length = len(a) - width + 1
+    sums = np.zeros(length, dtype=a.dtype)
+    # block[i] is the sum of the step values from a[i]
+    block = a
+    step = 1
+    offset = 0
+    while width:
+        if width & 1:
+            sums += block[offset:offset + length]
+            offset += step
+        width >>= 1
+        if width:
+            block = block[:-step] + block[step:]
+            step *= 2
+    return sums
+
+
+def _gradient(colors, zi=None):
+    """Calculates gradient color values.
+
+    The values g_{k+1} = (g_k + colors[k+1])/2 are computed
+    as a first order linear filter, and the filter state
+    g_k/2 lets the next chunk of colors carry on.
+
+    Parameters
+    ----------
+    colors: array
+        Contains color values, such as corner indexes
+    zi: array
+        Filter state of the previous chunk, defaulted
+        to starting at the first color: None
+
+    Returns
+    -------
+    color_array: array
+        Contains gradient color values
+    zf: array
+        Filter state after the last color
+    """
+    if zi is None:
+        zi = [colors[0]/2] if len(colors) else [0]
+    return scipy.signal.lfilter([1/2], [1, -1/2], colors, zi=zi)
+
+
+# shared arrays of the worker processes, set by _share
+_shared = {}
+
+
+def _share(buffers):
+    """Makes the shared arrays known to a worker process.
+
+    The arrays are handed over when the process starts,
+    so they are not copied for every chain.
+
+    Parameters
+    ----------
+    buffers: dict
+        Contains multiprocessing.RawArray objects
+    """
+    _shared.update(buffers)
+
+
+def _chain(n, r, seed, index, start, stop, discard, grid, chunk=1 << 20):
+    """Runs one chain of a parallel chaos game.
+
+    Parameters
+    ----------
+    n: int
+        Number of corners
+    r: float
+        Wanted ratio between two points
+    seed: SeedSequence
+        Seed of the random generator of the chain
+    index: int
+        Number of the chain
+    start: int
+        First iteration of the chain in the points
+    stop: int
+        Iteration after the last one of the chain
+    discard: int
+        Discarded iterations
+    grid: tuple
+        Extent and shape of the density histogram,
+        or None to store the points
+    chunk: int
+        Number of iterations per chunk
+    """
+    game = ChaosGame(n, r)
+    rng = np.random.default_rng(seed)
+    chunks = game.iter_chunks(chunk, stop - start, discard, rng)
+
+    if grid is None:
+        points = np.frombuffer(_shared["points"]).reshape(-1, 2)
+        colors = np.frombuffer(_shared["colors"])
+        for x_values, corners, _ in chunks:
+            points[start:start + len(corners)] = x_values
+            colors[start:start + len(corners)] = corners
+            start += len(corners)
+        return
+
+    # the chain adds into its own grid of the shared arrays
+    histogram = DensityHistogram(*grid)
+    shape = (-1,) + histogram.shape
+    histogram.counts = np.frombuffer(_shared["counts"],
+                                     np.int64).reshape(shape)[index]
+    color = len(_shared["color_sums"]) > 0
+    if color:
+        histogram.color_sums = np.frombuffer(
+            _shared["color_sums"]).reshape(shape)[index]
+    for x_values, _, gradient in chunks:
+        histogram.add(x_values, gradient if color else None)
+
+
+class DensityHistogram():
+    """Counts points in a fixed grid of pixels.
+
+    Points are added in batches, so the memory use and the
+    cost of drawing only depend on the number of pixels.
+
+    Attributes
+    ----------
+    extent: tuple
+        Contains xmin, xmax, ymin and ymax of the grid
+    counts: array
+        Contains the number of points per pixel, one row
+        per y value
+    color_sums: array
+        Contains the sum of the point colors per pixel
+    """
+    def __init__(self, extent, shape):
+        """Stores the grid.
+
+        Parameters
+        ----------
+        extent: tuple
+            Contains xmin, xmax, ymin and ymax of the grid
+        shape: tuple
+            Number of pixels along y and along x
+        """
+        self.extent = tuple(float(e) for e in extent)
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.counts = np.zeros(self.shape, dtype=np.int64)
+        self.color_sums = np.zeros(self.shape)
+
+    @classmethod
+    def around(cls, points, resolution=1000):
+        """Creates a grid over the bounding box of points.
+
+        Parameters
+        ----------
+        points: array
+            Contains coordinates, such as the corners of an n-gon
+        resolution: int
+            Number of pixels along the longest side
+
+        Returns
+        -------
+        histogram: DensityHistogram
+            Contains no points
+        """
+        points = np.asarray(points)
+        (xmin, ymin), (xmax, ymax) = points.min(axis=0), points.max(axis=0)
+        width, height = xmax - xmin, ymax - ymin
+        scale = resolution/max(width, height)
+        shape = (max(int(round(height*scale)), 1),
+                 max(int(round(width*scale)), 1))
+        return cls((xmin, xmax, ymin, ymax), shape)
+
+    def add(self, points, colors=None):
+        """Adds a batch of points to the pixels.
+
+        Points outside of the grid are left out.
+
+        Parameters
+        ----------
+        points: array
+            Contains coordinates, shape (number of points, 2)
+        colors: array
+            Contains one color value per point, such as
+            gradient_color. Defaulted to no colors: None
+        """
+        points = np.asarray(points)
+        xmin, xmax, ymin, ymax = self.extent
+        rows, cols = self.shape
+
+        col = np.floor((points[:, 0] - xmin)*(cols/(xmax - xmin)))
+        row = np.floor((points[:, 1] - ymin)*(rows/(ymax - ymin)))
+        # the points on the upper edges belong to the last pixel
+        col[points[:, 0] == xmax] = cols - 1
+        row[points[:, 1] == ymax] = rows - 1
+
+        inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+        pixel = (row[inside]*cols + col[inside]).astype(np.intp)
+
+        size = rows*cols
+        self.counts += np.bincount(pixel, minlength=size).reshape(self.shape)
+        if colors is not None:
+            colors = np.asarray(colors, dtype=float)[inside]
+            self.color_sums += np.bincount(pixel, weights=colors,
+                                           minlength=size).reshape(self.shape)
+
+    @property
+    def colors(self):
+        """Average color of the points in each pixel.
+
+        Returns
+        -------
+        colors: array
+            Contains the mean colors, nan for empty pixels
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.color_sums/self.counts
+
+    def image(self, cmap=None, vmin=None, vmax=None):
+        """Creates a log-scaled RGBA raster of the counts.
+
+        The opacity of a pixel is log(1 + count) relative
+        to the fullest pixel.
+
+        Parameters
+        ----------
+        cmap: str
+            A colormap for the average colors, black
+            pixels if not given. Defaulted to None
+        vmin: float
+            Color that is mapped to the start of cmap,
+            the smallest average color if not given
+        vmax: float
+            Color that is mapped to the end of cmap,
+            the largest average color if not given
+
+        Returns
+        -------
+        image: array
+            Contains RGBA values, shape (rows, columns, 4)
+        """
+        image = np.zeros(self.shape + (4,))
+        if cmap is not None:
+            colors = self.colors
+            if vmin is None:
+                vmin = np.nanmin(colors)
+            if vmax is None:
+                vmax = np.nanmax(colors)
+            norm = plt.Normalize(vmin, vmax)
+            image[:] = plt.get_cmap(cmap)(norm(np.nan_to_num(colors)))
+
+        image[..., 3] = np.log1p(self.counts)/np.log1p(max(self.counts.max(),
+                                                           1))
+        return image
+
+
 if __name__ == "__main__":
     for i in range(3, 9):
         c = ChaosGame(i)
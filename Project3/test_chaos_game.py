@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from chaos_game import ChaosGame
+from chaos_game import ChaosGame, DensityHistogram
 
 
 @pytest.mark.parametrize(
@@ -61,3 +61,182 @@ def test_corner_position_exercise_2i(arg, expect):
     for i in range(arg):
         for j in range(2):
             assert (calculated[i][j]-expect[i][j]) < 10**(-9)
+
+
+@pytest.mark.parametrize(
+    "n, r", [(3, 1/2), (4, 1/3), (5, 1/3), (6, 3/8), (9, 1/2)]
+)
+def test_iterate_same_as_loop(n, r):
+    """Tests if iterate gives the points of one iteration at a time.
+
+    The reference draws the same random numbers as iterate
+    did before it was vectorized.
+
+    Parameters
+    ----------
+    n: int
+        Number of corners for n-gon
+    r: float
+        Wanted ratio between two points
+    """
+    c = ChaosGame(n, r)
+    np.random.seed(n)
+    c.iterate(20000, discard=7)
+    after = np.random.random()
+
+    np.random.seed(n)
+    X0 = c._starting_point()
+    x_values = np.zeros([20007, 2])
+    colors = np.zeros(20007)
+    for i in range(20007):
+        np.random.random(size=n)
+        j = np.random.randint(0, n)
+        colors[i] = j
+        X0 = x_values[i] = r*X0 + (1 - r)*c.c[j]
+
+    assert np.array_equal(c.x_values, x_values[7:])
+    assert np.array_equal(c.colors, colors[7:])
+    assert np.random.random() == after
+
+
+@pytest.mark.parametrize("n", [3, 5, 8])
+def test_corner_indices_in_chunks(n):
+    """Tests if small draws give the indexes of one large draw.
+
+    The words after the last complete iteration of a draw are
+    carried into the next one.
+
+    Parameters
+    ----------
+    n: int
+        Number of corners for n-gon
+    """
+    c = ChaosGame(n)
+    np.random.seed(n)
+    corners = c._corner_indices(3000)
+    after = np.random.random()
+
+    np.random.seed(n)
+    assert np.array_equal(c._corner_indices(3000, chunk=50), corners)
+    assert np.random.random() == after
+
+
+def test_density_histogram():
+    """Tests if batches of points are counted in the right pixels.
+
+    The counts and colors of a histogram filled in batches
+    should be the ones of a histogram filled at once.
+    """
+    c = ChaosGame(5)
+    c.iterate(50000)
+    histogram = c.density(200, color=True)
+    assert histogram.counts.sum() == 50000
+    assert max(histogram.shape) == 200
+
+    batches = DensityHistogram.around(c.c, 200)
+    for start in range(0, 50000, 7000):
+        batches.add(c.x_values[start:start + 7000],
+                    c.gradient_color[start:start + 7000])
+    assert np.array_equal(batches.counts, histogram.counts)
+    assert np.allclose(batches.color_sums, histogram.color_sums)
+
+    one = DensityHistogram((0, 1, 0, 1), (2, 2))
+    one.add([[0.25, 0.75], [0.2, 0.7], [0.9, 0.1], [2, 2]], [1, 3, 5, 7])
+    assert np.array_equal(one.counts, [[0, 1], [2, 0]])
+    assert one.colors[1, 0] == 2
+
+    image = histogram.image("jet", vmin=0, vmax=4)
+    assert image.shape == histogram.shape + (4,)
+    assert image[..., 3].max() == 1
+    assert np.all(image[histogram.counts == 0, 3] == 0)
+
+
+def test_iter_chunks_same_as_iterate():
+    """Tests if joined chunks are the points of iterate.
+
+    The last point and the gradient color are carried
+    across the chunks, and the random state is left where
+    iterate leaves it.
+    """
+    c = ChaosGame(5, 1/3)
+    np.random.seed(3)
+    c.iterate(10000)
+    after = np.random.random()
+
+    np.random.seed(3)
+    chunks = list(c.iter_chunks(3000, total=10000))
+    assert [len(p) for p, _, _ in chunks] == [3000, 3000, 3000, 1000]
+    points, corners, gradient = (np.concatenate(a) for a in zip(*chunks))
+    assert np.array_equal(points, c.x_values)
+    assert np.array_equal(corners, c.colors)
+    assert np.array_equal(gradient, c.gradient_color)
+    assert np.random.random() == after
+
+    # small chunks are cut from blocks of whole chunks
+    np.random.seed(3)
+    chunks = list(c.iter_chunks(70, total=10000, block=1000))
+    assert [len(p) for p, _, _ in chunks] == [70]*142 + [60]
+    points, corners, gradient = (np.concatenate(a) for a in zip(*chunks))
+    assert np.array_equal(points, c.x_values)
+    assert np.array_equal(gradient, c.gradient_color)
+    assert np.random.random() == after
+
+    # without a total the chunks go on
+    np.random.seed(3)
+    stream = c.iter_chunks(4000)
+    histogram = DensityHistogram.around(c.c, 100)
+    for _ in range(5):
+        histogram.add(*next(stream)[::2])
+    assert histogram.counts.sum() == 20000
+
+    with pytest.raises(ValueError):
+        next(c.iter_chunks(0))
+
+
+def test_parallel_reproducible():
+    """Tests if parallel chains only depend on the seed.
+
+    Every chain should be the chain of iter_chunks with its
+    child seed, and the density histogram should count the
+    same points.
+    """
+    c = ChaosGame(5, 1/3)
+    c.iterate_parallel(10001, workers=2, seed=4)
+    x_values, colors = c.x_values, c.colors
+    c.iterate_parallel(10001, workers=2, seed=4)
+    assert np.array_equal(c.x_values, x_values)
+    assert np.array_equal(c.colors, colors)
+
+    children = np.random.SeedSequence(4).spawn(2)
+    for child, start, stop in zip(children, (0, 5001), (5001, 10001)):
+        rng = np.random.default_rng(child)
+        points, corners, _ = next(c.iter_chunks(5001, stop - start, rng=rng))
+        assert np.array_equal(x_values[start:stop], points)
+        assert np.array_equal(colors[start:stop], corners)
+
+    c.iterate_parallel(10001, workers=3, seed=4)
+    assert not np.array_equal(c.x_values, x_values)
+
+    histogram = c.density_parallel(10001, 100, color=True, workers=2, seed=4)
+    expected = DensityHistogram.around(c.c, 100)
+    expected.add(x_values)
+    assert np.array_equal(histogram.counts, expected.counts)
+    assert np.all(histogram.color_sums >= 0)
+
+
+def test_gradient_color():
+    """Tests if gradient_color is the blend of one color at a time.
+
+    The values should be computed once per call of iterate.
+    """
+    c = ChaosGame(4, 1/3)
+    c.iterate(5000)
+    color_array = np.zeros(5000)
+    color_array[0] = c.colors[0]
+    for i in range(4999):
+        color_array[i+1] = (color_array[i] + c.colors[i+1])/2
+    assert np.array_equal(c.gradient_color, color_array)
+    assert c.gradient_color is c.gradient_color
+
+    c.iterate(100)
+    assert len(c.gradient_color) == 100
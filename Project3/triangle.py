@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.signal
 import matplotlib.pyplot as plt
 
 
@@ -48,6 +49,10 @@ def random_iteration():
     10000 points, and stores color and position in arrays.
     Then it plots the points with colors corresponding to
     a random corner chosen in the iteration.
+
+    The colors are blended as c_{k+1} = (c_k + r_j)/2,
+    a first order linear filter over the corner colors,
+    after the iterations.
     """
     weights = calculate_weights()
     xpp = np.matmul(weights, corners)
@@ -63,26 +68,22 @@ def random_iteration():
 
     x_values = np.zeros([10000, 2])
     colors = np.zeros(10000)
-    colors_matrix = np.zeros([10000, 3])
 
     r = np.eye(3)
-    cp = 0
 
     for i in range(10000):
         weights = calculate_weights()
 
         j = np.random.randint(0, 3)
         corner = corners[j]
-        r_vec = r[j]
 
         colors[i] = j
-        colors_matrix[i] = j
-
-        colors_matrix[i] = (cp + r_vec)/2
         x_values[i] = (xp + corner)/2
 
         xp = x_values[i]
-        cp = colors_matrix[i]
+
+    colors_matrix = scipy.signal.lfilter([1/2], [1, -1/2],
+                                         r[colors.astype(int)], axis=0)
     red = x_values[colors == 0]
     green = x_values[colors == 1]
     blue = x_values[colors == 2]